@@ -1 +1,6 @@
+from . import cache
+from . import client
+from . import parsers
+from . import prices
+from . import queries
 from . import request_api
@@ -0,0 +1,193 @@
+"""
+Файл с кэшем ответов API. Кэш хранит ограниченное количество записей в памяти (вытеснение по LRU),
+каждая запись живёт не дольше ttl. В режиме 'sqlite' записи дополнительно сохраняются в БД
+и переживают перезапуск бота. Счётчики попаданий и промахов доступны через метод stats.
+"""
+
+import json
+import threading
+import time
+import metrics
+
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
+from database.connection import db
+from settings.settings import CACHE_STORAGE, CITY_CACHE_SIZE, CITY_CACHE_TTL, PROPERTY_CACHE_SIZE, \
+    PROPERTY_CACHE_TTL, PHOTO_CACHE_SIZE, PHOTO_CACHE_TTL
+
+
+class TTLCache:
+    """
+    Класс - потокобезопасный LRU-кэш с ограничением времени жизни записей
+    """
+    def __init__(self, name: str, maxsize: int, ttl: float, storage: str = 'memory') -> None:
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.persistent = storage == 'sqlite'
+        self.hits = 0
+        self.misses = 0
+        self._data: 'OrderedDict[str, Tuple[float, Any]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._last_purge = 0.0
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        Метод класса TTLCache (геттер), возвращающий значение по ключу, или None, если записи нет,
+        или её время жизни истекло.
+
+        :param key: str
+        :return: Optional[Any]
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] > now:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._data[key]
+        entry = self._load(key, now) if self.persistent else None
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._store(key, entry)
+            return entry[1]
+
+    def set(self, key: str, value: Any) -> None:
+        """
+        Метод класса TTLCache (сеттер), сохраняющий значение по ключу. В режиме 'sqlite' истёкшие записи
+        этого кэша удаляются из БД не чаще, чем раз в ttl секунд.
+
+        :param key: str
+        :param value: Any
+        :return: None
+        """
+        now = time.time()
+        entry = (now + self.ttl, value)
+        with self._lock:
+            self._store(key, entry)
+            purge = now - self._last_purge >= self.ttl
+            if purge:
+                self._last_purge = now
+        if self.persistent:
+            with db.transaction() as conn:
+                if purge:
+                    conn.execute("DELETE FROM 'table_cache' WHERE name = ? AND expires <= ?", (self.name, now))
+                conn.execute(
+                    "INSERT OR REPLACE INTO 'table_cache' (name, key, value, expires) VALUES (?, ?, ?, ?)",
+                    (self.name, key, json.dumps(value), entry[0])
+                )
+
+    def collect(self, key: str, items: Iterable[Any]) -> Iterator[Any]:
+        """
+        Метод класса TTLCache - генератор, возвращающий элементы items по одному и сохраняющий по ключу
+        словарь {'items': выданные элементы, 'complete': признак полного прохода}. Если потребитель остановился
+        раньше, то оставшиеся элементы не дочитываются (items закрывается), а в кэш попадает прочитанная часть
+        с complete = False. При ошибке чтения кэш не заполняется.
+
+        :param key: str
+        :param items: Iterable[Any]
+        :return: Iterator[Any]
+        """
+        items = iter(items)
+        collected = []
+        try:
+            for item in items:
+                collected.append(item)
+                yield item
+        except GeneratorExit:
+            if hasattr(items, 'close'):
+                items.close()
+            self.set(key, {'items': collected, 'complete': False})
+            raise
+        self.set(key, {'items': collected, 'complete': True})
+
+    def clear(self) -> None:
+        """
+        Метод класса TTLCache, очищающий кэш и счётчики
+
+        :return: None
+        """
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+        if self.persistent:
+            with db.transaction() as conn:
+                conn.execute("DELETE FROM 'table_cache' WHERE name = ?", (self.name, ))
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Метод класса TTLCache (геттер), возвращающий счётчики попаданий и промахов и текущий размер кэша
+
+        :return: Dict[str, Any]
+        """
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'name': self.name,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / total if total else 0.0,
+                'size': len(self._data),
+                'maxsize': self.maxsize
+            }
+
+    def _store(self, key: str, entry: Tuple[float, Any]) -> None:
+        """
+        Метод класса TTLCache, записывающий значение в память и вытесняющий самые старые записи.
+        Вызывается под блокировкой.
+
+        :param key: str
+        :param entry: Tuple[float, Any]
+        :return: None
+        """
+        self._data[key] = entry
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def _load(self, key: str, now: float) -> Optional[Tuple[float, Any]]:
+        """
+        Метод класса TTLCache, подгружающий не истёкшую запись из БД
+
+        :param key: str
+        :param now: float
+        :return: Optional[Tuple[float, Any]]
+        """
+        with db.transaction() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "SELECT expires, value FROM 'table_cache' WHERE name = ? AND key = ? AND expires > ?",
+                (self.name, key, now)
+            )
+            row = cursor.fetchone()
+        if row is None:
+            return None
+        return row[0], json.loads(row[1])
+
+
+city_cache = TTLCache('city', maxsize=CITY_CACHE_SIZE, ttl=CITY_CACHE_TTL, storage=CACHE_STORAGE)
+property_cache = TTLCache('property_records', maxsize=PROPERTY_CACHE_SIZE, ttl=PROPERTY_CACHE_TTL, storage=CACHE_STORAGE)
+photo_cache = TTLCache('photo_url', maxsize=PHOTO_CACHE_SIZE, ttl=PHOTO_CACHE_TTL, storage=CACHE_STORAGE)
+
+
+def cache_metrics() -> Iterator[Tuple[str, str, Dict[str, Any], float]]:
+    """
+    Функция - сборщик метрик кэшей: попадания, промахи и текущий размер каждого кэша
+
+    :return: Iterator[Tuple[str, str, Dict[str, Any], float]]
+    """
+    for cache in (city_cache, property_cache, photo_cache):
+        stats = cache.stats()
+        labels = {'cache': stats['name']}
+        yield 'bot_cache_hits_total', 'counter', labels, stats['hits']
+        yield 'bot_cache_misses_total', 'counter', labels, stats['misses']
+        yield 'bot_cache_size', 'gauge', labels, stats['size']
+
+
+metrics.registry.register_collector(cache_metrics)
@@ -0,0 +1,149 @@
+"""
+Файл с общим HTTP-клиентом для запросов к API hotels4 и к CDN с фотографиями отелей.
+Клиент держит пул keep-alive соединений (размер задаётся в settings), повторяет запросы
+при ответах 429/5xx с экспоненциальной задержкой и случайным разбросом (ожидание по заголовку Retry-After
+ограничено HTTP_MAX_RETRY_AFTER), а так же задаёт таймауты отдельно для каждого эндпоинта. Тяжёлые запросы
+(HEAVY_ENDPOINTS) после таймаута чтения не повторяются, чтобы не ждать ответа несколько раз подряд. Результаты проверки доступности фотографий кэшируются.
+"""
+
+import random
+import requests
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, List, Optional
+from requests import Response, RequestException
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from api_requests.cache import photo_cache
+from settings.settings import HTTP_POOL_SIZE, HTTP_RETRIES, HTTP_BACKOFF_FACTOR, HTTP_MAX_RETRY_AFTER, \
+    HTTP_CONNECT_TIMEOUT, TIMEOUTS, REQUEST_WORKERS, MEDIA_WORKERS
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+HEAVY_ENDPOINTS = frozenset(['property_list'])
+
+
+class JitterRetry(Retry):
+    """
+    Дочерний Класс (Родитель - Retry). Добавляет к экспоненциальной задержке между повторами случайный разброс
+    (full jitter), чтобы одновременные запросы не повторялись синхронно, и ограничивает ожидание
+    по заголовку Retry-After.
+    """
+    def get_backoff_time(self) -> float:
+        """
+        Метод класса JitterRetry, возвращающий случайную задержку в диапазоне от нуля до экспоненциальной
+
+        :return: float
+        """
+        backoff = super().get_backoff_time()
+        return random.uniform(0, backoff) if backoff else 0
+
+    def get_retry_after(self, response: Any) -> Optional[float]:
+        """
+        Метод класса JitterRetry, возвращающий задержку из заголовка Retry-After ответа,
+        но не больше HTTP_MAX_RETRY_AFTER секунд
+
+        :param response: Any
+        :return: Optional[float]
+        """
+        retry_after = super().get_retry_after(response)
+        if retry_after is None:
+            return None
+        return min(retry_after, HTTP_MAX_RETRY_AFTER)
+
+
+def create_session(read_retries: int = HTTP_RETRIES) -> requests.Session:
+    """
+    Функция - создающая сессию requests с пулом соединений и политикой повторов
+
+    :param read_retries: int
+    :return: requests.Session
+    """
+    retry = JitterRetry(
+        total=HTTP_RETRIES,
+        connect=HTTP_RETRIES,
+        read=read_retries,
+        status=HTTP_RETRIES,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=frozenset(['GET', 'HEAD']),
+        backoff_factor=HTTP_BACKOFF_FACTOR,
+        respect_retry_after_header=True,
+        raise_on_status=False
+    )
+    adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE, max_retries=retry)
+    new_session = requests.Session()
+    new_session.mount('https://', adapter)
+    new_session.mount('http://', adapter)
+    return new_session
+
+
+session = create_session()
+heavy_session = create_session(read_retries=0)
+request_executor = ThreadPoolExecutor(max_workers=REQUEST_WORKERS, thread_name_prefix='api')
+media_executor = ThreadPoolExecutor(max_workers=MEDIA_WORKERS, thread_name_prefix='media')
+
+
+def get(url: str, endpoint: str, **kwargs: Any) -> Response:
+    """
+    Функция - делающая GET-запрос через общую сессию с таймаутом, заданным для эндпоинта.
+    Запросы к эндпоинтам из HEAVY_ENDPOINTS делаются через сессию без повторов после таймаута чтения.
+
+    :param url: str
+    :param endpoint: str
+    :param kwargs: Any
+    :return: Response
+    """
+    endpoint_session = heavy_session if endpoint in HEAVY_ENDPOINTS else session
+    return endpoint_session.get(url, timeout=(HTTP_CONNECT_TIMEOUT, TIMEOUTS[endpoint]), **kwargs)
+
+
+def head(url: str, endpoint: str, **kwargs: Any) -> Response:
+    """
+    Функция - делающая HEAD-запрос через общую сессию с таймаутом, заданным для эндпоинта
+
+    :param url: str
+    :param endpoint: str
+    :param kwargs: Any
+    :return: Response
+    """
+    return session.head(url, timeout=(HTTP_CONNECT_TIMEOUT, TIMEOUTS[endpoint]), **kwargs)
+
+
+def check_url(url: str) -> Optional[bool]:
+    """
+    Функция - проверяющая доступность фотографии без её скачивания. Делается HEAD-запрос, а если сервер
+    не поддерживает HEAD, то GET-запрос первого байта (заголовок Range). Возвращает True, если статус-код
+    ответа начинается на '2', или None, если результат временный (ошибка сети, или статус из RETRY_STATUSES
+    после всех повторов).
+
+    :param url: str
+    :return: Optional[bool]
+    """
+    try:
+        response = head(url, 'media', allow_redirects=True)
+        if response.status_code in (405, 501):
+            response = get(url, 'media', headers={'Range': 'bytes=0-0'}, stream=True)
+            response.close()
+    except RequestException:
+        return None
+    if response.status_code in RETRY_STATUSES:
+        return None
+    return str(response.status_code).startswith('2')
+
+
+def check_urls(urls: List[str]) -> List[bool]:
+    """
+    Функция - проверяющая доступность списка фотографий. Результат проверки каждого url берётся из кэша
+    (photo_cache), а не проверенные ранее url проверяются параллельно в пуле потоков (функция 'check_url')
+    и сохраняются в кэш. Временные результаты (None) в кэш не сохраняются и считаются недоступностью.
+    Возвращает список результатов в порядке url.
+
+    :param urls: List[str]
+    :return: List[bool]
+    """
+    statuses = [photo_cache.get(url) for url in urls]
+    unchecked = [url for url, status in zip(urls, statuses) if status is None]
+    checked = dict(zip(unchecked, media_executor.map(check_url, unchecked)))
+    for url, status in checked.items():
+        if status is not None:
+            photo_cache.set(url, status)
+    return [bool(checked[url]) if status is None else status for url, status in zip(urls, statuses)]
@@ -0,0 +1,156 @@
+"""
+Файл с разбором ответов API hotels4. Из словаря отеля извлекаются типизированные поля (id, название, адрес,
+расстояние до центра в километрах, цена за сутки, валюта, звёзды), которые сохраняются в БД
+и подставляются в шаблон сообщения только при показе. Список отелей из ответа properties/list
+разбирается потоково: отели декодируются по одному прямо из поступающих байтов ответа.
+Ответ locations/v2/search разбирается как JSON в список городов (destinationId, название, подпись).
+"""
+
+import codecs
+import html
+import json
+import re
+
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from requests import Response
+from database.models import Hotel
+from .prices import hotel_price
+
+DISTANCE_NUMBER = re.compile(r'\d+(?:[.,]\d+)?')
+MILE_KM = 1.609344
+SEARCH_RESULTS_KEY = '"searchResults"'
+RESULTS_ARRAY = re.compile(r'"results"\s*:\s*\[')
+KEY_TAIL = 64
+STREAM_CHUNK_SIZE = 16384
+decoder = json.JSONDecoder()
+CITY_GROUP = 'CITY_GROUP'
+HTML_TAG = re.compile(r'<[^>]*>')
+
+
+def parse_city_list(content: bytes) -> List[Tuple[str, str, str]]:
+    """
+    Функция - извлекающая из ответа locations/v2/search список городов группы CITY_GROUP в виде кортежей
+    (destinationId, название города, подпись). Из подписи удаляется HTML-подсветка совпадений.
+    Если в ответе нет подходящих городов, возвращает пустой список.
+
+    :param content: bytes
+    :return: List[Tuple[str, str, str]]
+    """
+    cities = []
+    for group in json.loads(content).get('suggestions') or []:
+        if group.get('group') != CITY_GROUP:
+            continue
+        for entity in group.get('entities') or []:
+            destination_id = entity.get('destinationId')
+            name = entity.get('name')
+            if destination_id and name:
+                caption = html.unescape(HTML_TAG.sub('', entity.get('caption') or name))
+                cities.append((str(destination_id), name, caption))
+    return cities
+
+
+def iter_results(chunks: Iterable[bytes]) -> Iterator[Dict]:
+    """
+    Функция - генератор, возвращающий отели из массива data.body.searchResults.results ответа properties/list
+    по одному. Байты ответа декодируются по мере поступления, всё до массива results пропускается
+    без разбора, а в памяти держится только ещё не разобранный отель. Если массив в ответе не найден,
+    или ответ оборвался, то выбрасывается ValueError.
+
+    :param chunks: Iterable[bytes]
+    :return: Iterator[Dict]
+    """
+    chunks = iter(chunks)
+    utf8 = codecs.getincrementaldecoder('utf-8')()
+    buffer = ''
+    position = None
+    in_search_results = False
+    for chunk in chunks:
+        buffer += utf8.decode(chunk)
+        if not in_search_results:
+            index = buffer.find(SEARCH_RESULTS_KEY)
+            if index == -1:
+                buffer = buffer[-KEY_TAIL:]
+                continue
+            in_search_results = True
+            buffer = buffer[index:]
+        found = RESULTS_ARRAY.search(buffer)
+        if found is not None:
+            position = found.end()
+            break
+    if position is None:
+        raise ValueError('В ответе нет списка отелей')
+    while True:
+        while position < len(buffer) and buffer[position] in ' \t\r\n,':
+            position += 1
+        if position < len(buffer) and buffer[position] == ']':
+            return
+        try:
+            hotel, position = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            chunk = next(chunks, None)
+            if chunk is None:
+                raise ValueError('Ответ со списком отелей оборвался')
+            buffer = buffer[position:] + utf8.decode(chunk)
+            position = 0
+            continue
+        yield hotel
+
+
+def stream_results(response: Response) -> Iterator[Dict]:
+    """
+    Функция - генератор, возвращающий отели из потокового ответа properties/list (запрос с stream=True).
+    После разбора, или при досрочном завершении, соединение возвращается в пул.
+
+    :param response: Response
+    :return: Iterator[Dict]
+    """
+    try:
+        yield from iter_results(response.iter_content(chunk_size=STREAM_CHUNK_SIZE))
+    finally:
+        response.close()
+
+
+def parse_distance_km(distance: str) -> Optional[float]:
+    """
+    Функция - переводящая строку расстояния из ответа API ('0.7 miles', '1,2 км') в километры
+
+    :param distance: str
+    :return: Optional[float]
+    """
+    found = DISTANCE_NUMBER.search(distance)
+    if found is None:
+        return None
+    distance_km = float(found.group().replace(',', '.'))
+    if 'mile' in distance:
+        distance_km *= MILE_KM
+    return distance_km
+
+
+def parse_hotel(hotel: Dict, currency: str, locale: str, user_id: int, command_id: int) -> Optional[Hotel]:
+    """
+    Функция - собирающая из словаря отеля в ответе API экземпляр Hotel. Цена за сутки получается
+    в модуле prices. Если у отеля нет id, названия, или цены, то возвращает None. Отсутствующие адрес,
+    расстояние и звёзды не исключают отель из выдачи.
+
+    :param hotel: Dict
+    :param currency: str
+    :param locale: str
+    :param user_id: int
+    :param command_id: int
+    :return: Optional[Hotel]
+    """
+    price = hotel_price(hotel, locale)
+    if price is None or 'id' not in hotel or 'name' not in hotel:
+        return None
+    landmarks = hotel.get('landmarks') or [{}]
+    return Hotel(
+        user_id=user_id,
+        command_id=command_id,
+        hotel_id=int(hotel['id']),
+        name=hotel['name'],
+        address=(hotel.get('address') or {}).get('streetAddress', ''),
+        distance_km=parse_distance_km(landmarks[0].get('distance', '')),
+        price=price,
+        currency=currency,
+        stars=hotel.get('starRating')
+    )
@@ -0,0 +1,59 @@
+"""
+Файл с нормализацией цен из ответа API properties/list. Если в ответе есть точная цена
+(ratePlan.price.exactCurrent), то используется она. Иначе цена извлекается из строки ratePlan.price.current
+('$1,234', '1,234 RUB', '1 234,50 €') разборщиком, который собирается один раз для локали.
+"""
+
+import re
+
+from functools import lru_cache
+from typing import Callable, Dict, Optional
+
+NUMBER_PATTERNS = {
+    'en_US': (r'\d{1,3}(?:,\d{3})+(?:\.\d+)?|\d+(?:\.\d+)?', r',', '.'),
+    'ru_RU': (
+        r'\d{1,3}(?:[ \u00a0\u202f]\d{3})+(?:,\d+)?|\d{1,3}(?:,\d{3})+(?!\d)(?:\.\d+)?|\d+(?:,\d+)?',
+        r'[ \u00a0\u202f]|,(?=\d{3}(?!\d))', ','
+    ),
+}
+
+
+@lru_cache(maxsize=None)
+def price_parser(locale: str) -> Callable[[str], Optional[float]]:
+    """
+    Функция - возвращающая (с кэшированием) разборщик строки цены для локали.
+    Разделители разрядов и десятичный разделитель берутся из локали. Для ru_RU запятая, за которой
+    следуют ровно три цифры ('1,234 RUB'), считается разделителем разрядов, как и в migrations.legacy_number.
+
+    :param locale: str
+    :return: Callable[[str], Optional[float]]
+    """
+    pattern, group_separator, decimal_separator = NUMBER_PATTERNS.get(locale, NUMBER_PATTERNS['en_US'])
+    number = re.compile(pattern)
+    separators = re.compile(group_separator)
+
+    def parse(current: str) -> Optional[float]:
+        found = number.search(current)
+        if found is None:
+            return None
+        return float(separators.sub('', found.group()).replace(decimal_separator, '.'))
+    return parse
+
+
+def hotel_price(hotel: Dict, locale: str) -> Optional[int]:
+    """
+    Функция - возвращающая цену отеля за сутки (в валюте запроса), или None, если цены в ответе нет
+
+    :param hotel: Dict
+    :param locale: str
+    :return: Optional[int]
+    """
+    price = (hotel.get('ratePlan') or {}).get('price') or {}
+    exact = price.get('exactCurrent')
+    if isinstance(exact, (int, float)):
+        return round(exact)
+    current = price.get('current')
+    if not isinstance(current, str):
+        return None
+    value = price_parser(locale)(current)
+    return None if value is None else round(value)
@@ -0,0 +1,159 @@
+"""
+Файл с неизменяемыми параметрами запросов к API. Каждый запрос собирается заново из данных сессии пользователя,
+а словари QUERY_* из settings используются только как шаблон значений по умолчанию и никогда не изменяются.
+"""
+
+import string
+
+from dataclasses import dataclass, replace
+from typing import Dict, Optional
+from database.models import User
+from settings import constants
+from settings.settings import QUERY_SEARCH, QUERY_PROPERTY_LIST, QUERY_BESTDEAL, QUERY_PHOTO
+
+
+@dataclass(frozen=True)
+class SearchQuery:
+    """
+    Dataclass - параметры запроса на поиск города (locations/v2/search)
+    """
+    query: str
+    locale: str
+    currency: str
+
+    @property
+    def cache_key(self) -> str:
+        """
+        Свойство класса SearchQuery, возвращающее ключ кэша: нормализованный запрос, locale и валюта
+
+        :return: str
+        """
+        normalized = ' '.join(self.query.split()).casefold()
+        return '|'.join((normalized, self.locale, self.currency))
+
+    def params(self) -> Dict[str, str]:
+        """
+        Метод класса SearchQuery, возвращающий новый словарь параметров запроса
+
+        :return: Dict[str, str]
+        """
+        params = dict(QUERY_SEARCH)
+        params.update(query=self.query, locale=self.locale, currency=self.currency)
+        return params
+
+
+@dataclass(frozen=True)
+class PropertyListQuery:
+    """
+    Dataclass - параметры запроса на список отелей (properties/list) для команд lowprice, highprice и bestdeal
+    """
+    destination_id: str
+    check_in: str
+    check_out: str
+    currency: str
+    locale: str
+    sort_order: str
+    page_number: int = 1
+    price_min: Optional[int] = None
+    price_max: Optional[int] = None
+
+    @property
+    def is_bestdeal(self) -> bool:
+        """
+        Свойство класса PropertyListQuery, указывающее, что запрос сформирован для команды bestdeal
+
+        :return: bool
+        """
+        return self.price_min is not None
+
+    @property
+    def cache_key(self) -> str:
+        """
+        Свойство класса PropertyListQuery, возвращающее ключ кэша - полный набор параметров запроса
+
+        :return: str
+        """
+        return '&'.join('{}={}'.format(key, value) for key, value in sorted(self.params().items()))
+
+    def page(self, page_number: int) -> 'PropertyListQuery':
+        """
+        Метод класса PropertyListQuery, возвращающий копию запроса для другой страницы выдачи
+
+        :param page_number: int
+        :return: PropertyListQuery
+        """
+        return replace(self, page_number=page_number)
+
+    def params(self) -> Dict[str, str]:
+        """
+        Метод класса PropertyListQuery, возвращающий новый словарь параметров запроса
+
+        :return: Dict[str, str]
+        """
+        params = dict(QUERY_BESTDEAL if self.is_bestdeal else QUERY_PROPERTY_LIST)
+        params.update(
+            destinationId=self.destination_id,
+            pageNumber=str(self.page_number),
+            checkIn=self.check_in,
+            checkOut=self.check_out,
+            sortOrder=self.sort_order,
+            locale=self.locale,
+            currency=self.currency
+        )
+        if self.is_bestdeal:
+            params.update(priceMin=str(self.price_min), priceMax=str(self.price_max))
+        return params
+
+
+def search_query(text: str, currency: str) -> SearchQuery:
+    """
+    Функция - собирающая параметры поиска города. Если введённые пользователем символы не входят
+    в ASCII, то поиск ведётся с параметром locale ru_RU, в противном случае - en_US.
+
+    :param text: str
+    :param currency: str
+    :return: SearchQuery
+    """
+    locale = 'en_US'
+    for sym in text:
+        if sym not in string.printable:
+            locale = 'ru_RU'
+            break
+    return SearchQuery(query=text, locale=locale, currency=currency or QUERY_SEARCH['currency'])
+
+
+def property_list_query(user: User, page_number: int = 1) -> PropertyListQuery:
+    """
+    Функция - собирающая параметры поиска отелей из данных сессии пользователя.
+    Порядок сортировки и диапазон цен выбираются исходя из команды пользователя.
+
+    :param user: User
+    :param page_number: int
+    :return: PropertyListQuery
+    """
+    if user.command == constants.BESTDEAL[1:]:
+        return PropertyListQuery(
+            destination_id=user.city_id, check_in=user.date_in, check_out=user.date_out,
+            currency=user.currency, locale=user.locale, sort_order=QUERY_BESTDEAL['sortOrder'],
+            page_number=page_number, price_min=user.price_min, price_max=user.price_max
+        )
+    if user.command == constants.HIGHPRICE[1:]:
+        sort_order = '-PRICE'
+    else:
+        sort_order = QUERY_PROPERTY_LIST['sortOrder']
+    return PropertyListQuery(
+        destination_id=user.city_id, check_in=user.date_in, check_out=user.date_out,
+        currency=user.currency, locale=user.locale, sort_order=sort_order, page_number=page_number
+    )
+
+
+def photo_query(hotel_id: int) -> Dict[str, str]:
+    """
+    Функция - возвращающая новый словарь параметров запроса фотографий отеля
+
+    :param hotel_id: int
+    :return: Dict[str, str]
+    """
+    params = dict(QUERY_PHOTO)
+    params['id'] = str(hotel_id)
+    return params
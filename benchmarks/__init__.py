@@ -0,0 +1,3 @@
+"""
+Пакет с бенчмарками бота. Каждый модуль запускается отдельно: python -m benchmarks.<модуль>
+"""
@@ -0,0 +1,101 @@
+"""
+Бенчмарк разбора ответа locations/v2/search: прежний разбор регулярными выражениями по тексту ответа
+против разбора JSON (api_requests.parsers.parse_city_list) на ответах из папки fixtures.
+Для каждого ответа выводится время одного разбора и совпадение результата с эталоном
+(пары destinationId - название из JSON-ответа).
+
+Запуск: python -m benchmarks.city_parser [количество повторов]
+"""
+
+import json
+import re
+import sys
+import timeit
+
+from pathlib import Path
+from typing import List, Optional, Tuple
+from api_requests.parsers import parse_city_list
+
+FIXTURES = Path(__file__).parent / 'fixtures'
+DEFAULT_NUMBER = 2000
+
+
+def regex_city_list(response_text: str) -> List[Tuple[str, str]]:
+    """
+    Функция - прежний разбор ответа регулярными выражениями (из handlers.lowprice_highprice.search_city)
+
+    :param response_text: str
+    :return: List[Tuple[str, str]]
+    """
+    pattern_city_group = r'(?<="CITY_GROUP",).+?[\]]'
+    find_cities = re.findall(pattern_city_group, response_text)
+    if len(find_cities[0]) > 20:
+        pattern_dest = r'(?<="destinationId":")\d+'
+        destination = re.findall(pattern_dest, find_cities[0])
+        pattern_city = r'(?<="name":")\w+[\s, \w]\w+'
+        city = re.findall(pattern_city, find_cities[0])
+        return list(zip(destination, city))
+    return []
+
+
+def expected_city_list(content: bytes) -> List[Tuple[str, str]]:
+    """
+    Функция - эталонный список городов ответа (все сущности группы CITY_GROUP)
+
+    :param content: bytes
+    :return: List[Tuple[str, str]]
+    """
+    return [
+        (entity['destinationId'], entity['name'])
+        for group in json.loads(content)['suggestions'] if group['group'] == 'CITY_GROUP'
+        for entity in group['entities']
+    ]
+
+
+def run_regex(content: bytes) -> Optional[List[Tuple[str, str]]]:
+    """
+    Функция - прежний путь разбора целиком (декодирование ответа в текст и регулярные выражения).
+    Возвращает None, если разбор завершился исключением.
+
+    :param content: bytes
+    :return: Optional[List[Tuple[str, str]]]
+    """
+    try:
+        return regex_city_list(content.decode('utf-8'))
+    except IndexError:
+        return None
+
+
+def run_json(content: bytes) -> List[Tuple[str, str]]:
+    """
+    Функция - новый путь разбора (JSON), приведённый к парам destinationId - название
+
+    :param content: bytes
+    :return: List[Tuple[str, str]]
+    """
+    return [(destination_id, name) for destination_id, name, _ in parse_city_list(content)]
+
+
+def main(number: int = DEFAULT_NUMBER) -> None:
+    """
+    Функция - запускающая бенчмарк на всех ответах из папки fixtures и выводящая таблицу результатов
+
+    :param number: int
+    :return: None
+    """
+    print('{:<32} {:>12} {:>12} {:>9} {:>9}'.format('fixture', 'regex, мкс', 'json, мкс', 'regex ok', 'json ok'))
+    for fixture in sorted(FIXTURES.glob('search_*.json')):
+        content = fixture.read_bytes()
+        expected = expected_city_list(content)
+        results = []
+        for parser in (run_regex, run_json):
+            seconds = min(timeit.repeat(lambda: parser(content), number=number, repeat=5))
+            results.append((seconds / number * 1e6, parser(content) == expected))
+        (regex_time, regex_ok), (json_time, json_ok) = results
+        print('{:<32} {:>12.1f} {:>12.1f} {:>9} {:>9}'.format(
+            fixture.stem, regex_time, json_time, str(regex_ok), str(json_ok)
+        ))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_NUMBER)
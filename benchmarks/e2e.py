@@ -0,0 +1,154 @@
+"""
+Сквозной бенчмарк переписки с ботом без обращения к rapidapi.com и Telegram. Запускает локальные заменители
+API hotels4 и Telegram Bot API (benchmarks.fake_servers) с заданной задержкой, направляет на них бота
+(HOTELS_API_URL, TELEGRAM_API_URL) и прогоняет сценарии (benchmarks.scenarios) через настоящие обработчики.
+Для каждого сценария выводится p50/p95/p99 каждого шага и количество запросов к API на одну переписку.
+База данных создаётся во временной папке. Ограничения частоты отправки (SEND_*) по умолчанию сняты,
+чтобы они не скрывали время работы кода; их можно задать переменными окружения.
+
+Запуск: python -m benchmarks.e2e [--conversations N] [--concurrency N] [--hotels-latency мс]
+[--telegram-latency мс] [--cold] [сценарии...]
+"""
+
+import argparse
+import math
+import os
+import sys
+import tempfile
+
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+from benchmarks.fake_servers import FakeHotelsApi, FakeTelegramApi
+
+DEFAULT_CONVERSATIONS = 20
+FIRST_CHAT_ID = 100000
+PERCENTILES = (50, 95, 99)
+BENCHMARK_ENV = {
+    'SEND_GLOBAL_RATE': '100000',
+    'SEND_CHAT_RATE': '100000',
+    'SEND_CHAT_BURST': '100000',
+}
+
+
+def percentile(values: List[float], q: float) -> float:
+    """
+    Функция - возвращающая перцентиль q списка значений (метод ближайшего ранга)
+
+    :param values: List[float]
+    :param q: float
+    :return: float
+    """
+    ordered = sorted(values)
+    return ordered[max(math.ceil(q / 100 * len(ordered)) - 1, 0)]
+
+
+def configure(hotels: FakeHotelsApi, telegram: FakeTelegramApi, db_dir: str) -> None:
+    """
+    Функция - направляющая бота на заменители и временную базу данных. Вызывается до импорта модулей бота.
+
+    :param hotels: FakeHotelsApi
+    :param telegram: FakeTelegramApi
+    :param db_dir: str
+    :return: None
+    """
+    os.environ.update(
+        HOTELS_API_URL=hotels.url, TELEGRAM_API_URL=telegram.url, TOKEN='0:benchmark',
+        DB_PATH=os.path.join(db_dir, 'benchmark.db'), BOT_RUNTIME='sharded', BOT_MODE='polling'
+    )
+    for key, value in BENCHMARK_ENV.items():
+        os.environ.setdefault(key, value)
+
+
+def run_scenario(name: str, conversations: int, concurrency: int, first_chat_id: int,
+                 telegram: FakeTelegramApi, cold: bool) -> List[Dict[str, float]]:
+    """
+    Функция - выполняющая conversations переписок по сценарию (по concurrency одновременно, каждая в своём чате).
+    Если задан cold, то перед каждой перепиской очищаются кэши ответов API.
+
+    :param name: str
+    :param conversations: int
+    :param concurrency: int
+    :param first_chat_id: int
+    :param telegram: FakeTelegramApi
+    :param cold: bool
+    :return: List[Dict[str, float]]
+    """
+    from api_requests.cache import city_cache, property_cache, photo_cache
+    from benchmarks.scenarios import SCENARIOS, Conversation
+
+    def conversation(chat_id: int) -> Dict[str, float]:
+        if cold:
+            for cache in (city_cache, property_cache, photo_cache):
+                cache.clear()
+        return Conversation(chat_id, telegram).run(SCENARIOS[name])
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        return list(executor.map(conversation, range(first_chat_id, first_chat_id + conversations)))
+
+
+def report(name: str, timings: List[Dict[str, float]], calls: Counter) -> None:
+    """
+    Функция - выводящая перцентили времени шагов сценария и количество запросов к API на одну переписку
+
+    :param name: str
+    :param timings: List[Dict[str, float]]
+    :param calls: Counter
+    :return: None
+    """
+    print('\n{} ({} переписок)'.format(name, len(timings)))
+    print('{:<16} {:>10} {:>10} {:>10}'.format('шаг', *('p{}, мс'.format(q) for q in PERCENTILES)))
+    steps = list(timings[0]) + ['total']
+    for step in steps:
+        if step == 'total':
+            values = [sum(timing.values()) for timing in timings]
+        else:
+            values = [timing[step] for timing in timings]
+        print('{:<16} {:>10.1f} {:>10.1f} {:>10.1f}'.format(
+            step, *(percentile(values, q) * 1000 for q in PERCENTILES)
+        ))
+    print('запросов на переписку:', ', '.join(
+        '{} {:.1f}'.format(method, count / len(timings)) for method, count in sorted(calls.items())
+    ))
+
+
+def main(argv: List[str]) -> None:
+    """
+    Функция - запускающая заменители, бота и выбранные сценарии
+
+    :param argv: List[str]
+    :return: None
+    """
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.e2e')
+    parser.add_argument('scenarios', nargs='*', default=['lowprice', 'lowprice_photo', 'bestdeal', 'history'])
+    parser.add_argument('--conversations', type=int, default=DEFAULT_CONVERSATIONS)
+    parser.add_argument('--concurrency', type=int, default=1)
+    parser.add_argument('--hotels-latency', type=float, default=50, help='задержка ответа hotels4, мс')
+    parser.add_argument('--telegram-latency', type=float, default=20, help='задержка ответа Telegram, мс')
+    parser.add_argument('--cold', action='store_true', help='очищать кэши ответов API перед каждой перепиской')
+    args = parser.parse_args(argv)
+
+    hotels = FakeHotelsApi(args.hotels_latency / 1000).start()
+    telegram = FakeTelegramApi(args.telegram_latency / 1000).start()
+    with tempfile.TemporaryDirectory() as db_dir:
+        configure(hotels, telegram, db_dir)
+        import handlers
+        from database.models import DataBaseModel
+        from benchmarks.scenarios import SCENARIOS
+
+        DataBaseModel.migrate()
+        first_chat_id = FIRST_CHAT_ID
+        for name in args.scenarios:
+            if name not in SCENARIOS:
+                parser.error('неизвестный сценарий {}, доступны: {}'.format(name, ', '.join(SCENARIOS)))
+            before = Counter(hotels.calls) + Counter({'tg.' + key: value for key, value in telegram.calls.items()})
+            timings = run_scenario(name, args.conversations, args.concurrency, first_chat_id, telegram, args.cold)
+            after = Counter(hotels.calls) + Counter({'tg.' + key: value for key, value in telegram.calls.items()})
+            report(name, timings, after - before)
+            first_chat_id += args.conversations
+    hotels.shutdown()
+    telegram.shutdown()
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
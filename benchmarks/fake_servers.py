@@ -0,0 +1,305 @@
+"""
+Локальные заменители внешних сервисов для сквозного бенчмарка (benchmarks.e2e): API hotels4 и Telegram Bot API.
+Оба сервера отвечают с настраиваемой задержкой и считают запросы по методам. Заменитель hotels4 отдаёт
+сохранённые ответы из папки fixtures (locations/v2/search, properties/list, get-hotel-photos) и сам
+раздаёт фотографии, на которые ссылаются ответы. Заменитель Telegram запоминает отправленные
+сообщения (текст и клавиатуру), чтобы сценарий мог нажимать кнопки так же, как пользователь.
+"""
+
+import hashlib
+import itertools
+import json
+import sys
+import threading
+import time
+
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qs, urlsplit
+
+FIXTURES = Path(__file__).parent / 'fixtures'
+CDN_URL = 'https://exp.cdn-hotels.com/'
+DEFAULT_SEARCH = 'search_new_york.json'
+
+
+class FakeHandler(BaseHTTPRequestHandler):
+    """
+    Дочерний Класс (Родитель - BaseHTTPRequestHandler). Передаёт запросы в метод handle_request сервера
+    и отправляет ответ с Content-Length (соединения keep-alive, как у настоящих сервисов)
+    """
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def do_GET(self) -> None:
+        """
+        Метод класса FakeHandler, обрабатывающий GET-запрос
+
+        :return: None
+        """
+        self.respond()
+
+    def do_HEAD(self) -> None:
+        """
+        Метод класса FakeHandler, обрабатывающий HEAD-запрос
+
+        :return: None
+        """
+        self.respond(with_body=False)
+
+    def do_POST(self) -> None:
+        """
+        Метод класса FakeHandler, обрабатывающий POST-запрос
+
+        :return: None
+        """
+        self.respond()
+
+    def respond(self, with_body: bool = True) -> None:
+        """
+        Метод класса FakeHandler, выполняющий запрос с задержкой сервера и отправляющий ответ
+
+        :param with_body: bool
+        :return: None
+        """
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        url = urlsplit(self.path)
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        if body and self.headers.get('Content-Type', '').startswith('application/x-www-form-urlencoded'):
+            params.update({key: values[-1] for key, values in parse_qs(body.decode()).items()})
+        time.sleep(self.server.latency)
+        status, content_type, content = self.server.handle_request(url.path, params)
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        if with_body:
+            self.wfile.write(content)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        """
+        Метод класса FakeHandler, отключающий журнал запросов http.server
+
+        :param format: str
+        :param args: Any
+        :return: None
+        """
+
+
+class FakeServer(ThreadingHTTPServer):
+    """
+    Дочерний Класс (Родитель - ThreadingHTTPServer). Основа заменителей: запуск в отдельном потоке,
+    задержка ответа (latency, в секундах) и счётчик запросов по методам
+    """
+    daemon_threads = True
+
+    def __init__(self, latency: float = 0.0) -> None:
+        super().__init__(('127.0.0.1', 0), FakeHandler)
+        self.latency = latency
+        self.calls: Counter = Counter()
+        self._lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        """
+        Свойство класса FakeServer, возвращающее адрес сервера
+
+        :return: str
+        """
+        return 'http://{}:{}'.format(*self.server_address)
+
+    def start(self) -> 'FakeServer':
+        """
+        Метод класса FakeServer, запускающий сервер в фоновом потоке
+
+        :return: FakeServer
+        """
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def handle_error(self, request: Any, client_address: Any) -> None:
+        """
+        Метод класса FakeServer, не выводящий разрыв соединения клиентом (бот закрывает потоковый ответ
+        properties/list, не дочитав его), остальные ошибки выводятся как обычно
+
+        :param request: Any
+        :param client_address: Any
+        :return: None
+        """
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+    def count(self, method: str) -> None:
+        """
+        Метод класса FakeServer, учитывающий запрос к методу
+
+        :param method: str
+        :return: None
+        """
+        with self._lock:
+            self.calls[method] += 1
+
+    def handle_request(self, path: str, params: Dict[str, str]) -> tuple:
+        """
+        Метод класса FakeServer, возвращающий ответ на запрос: (статус-код, Content-Type, тело ответа)
+
+        :param path: str
+        :param params: Dict[str, str]
+        :return: tuple
+        """
+        raise NotImplementedError
+
+
+class FakeHotelsApi(FakeServer):
+    """
+    Дочерний Класс (Родитель - FakeServer). Заменитель API hotels4. Адреса фотографий в ответах
+    get-hotel-photos переписываются на этот же сервер (отдельно для каждого отеля).
+    """
+    def handle_request(self, path: str, params: Dict[str, str]) -> tuple:
+        """
+        Метод класса FakeHotelsApi, возвращающий сохранённый ответ эндпоинта
+
+        :param path: str
+        :param params: Dict[str, str]
+        :return: tuple
+        """
+        if path == '/locations/v2/search':
+            self.count('search')
+            fixture = FIXTURES / 'search_{}.json'.format(params.get('query', '').lower().replace(' ', '_'))
+            if not fixture.exists():
+                fixture = FIXTURES / DEFAULT_SEARCH
+            return 200, 'application/json', fixture.read_bytes()
+        if path == '/properties/list':
+            self.count('property_list')
+            return 200, 'application/json', (FIXTURES / 'properties_list.json').read_bytes()
+        if path == '/properties/get-hotel-photos':
+            self.count('photo')
+            photos = (FIXTURES / 'hotel_photos.json').read_text()
+            cdn = '{}/cdn/{}/'.format(self.url, params.get('id', '0'))
+            return 200, 'application/json', photos.replace(CDN_URL, cdn).encode()
+        if path.startswith('/cdn/'):
+            self.count('media')
+            return 200, 'image/jpeg', b'\xff\xd8\xff\xd9'
+        return 404, 'application/json', b'{}'
+
+
+class FakeTelegramApi(FakeServer):
+    """
+    Дочерний Класс (Родитель - FakeServer). Заменитель Telegram Bot API (адрес вида /bot<токен>/<метод>).
+    Хранит последнее состояние каждого отправленного сообщения и считает запросы по чатам.
+    """
+    def __init__(self, latency: float = 0.0) -> None:
+        super().__init__(latency)
+        self.messages: Dict[int, Dict[int, Dict]] = {}
+        self.chat_calls: Counter = Counter()
+        self._message_ids = itertools.count(1)
+
+    def handle_request(self, path: str, params: Dict[str, str]) -> tuple:
+        """
+        Метод класса FakeTelegramApi, выполняющий метод Bot API и возвращающий ответ в формате Telegram
+
+        :param path: str
+        :param params: Dict[str, str]
+        :return: tuple
+        """
+        method = path.rsplit('/', 1)[-1]
+        self.count(method)
+        chat_id = int(params['chat_id']) if 'chat_id' in params else None
+        if chat_id is not None:
+            with self._lock:
+                self.chat_calls[chat_id] += 1
+        if method == 'getMe':
+            result = {'id': 1, 'is_bot': True, 'first_name': 'bench', 'username': 'bench_bot'}
+        elif method == 'sendMessage':
+            result = self.store(chat_id, {'text': params.get('text', '')}, params.get('reply_markup'))
+        elif method == 'sendMediaGroup':
+            media = json.loads(params.get('media', '[]'))
+            result = [
+                self.store(chat_id, {'photo': self.photo_sizes(item['media']), 'caption': item.get('caption')}, None)
+                for item in media
+            ]
+        elif method in ('editMessageText', 'editMessageReplyMarkup'):
+            result = self.edit(chat_id, int(params['message_id']), params.get('text'), params.get('reply_markup'))
+            if result is None:
+                return 400, 'application/json', json.dumps({
+                    'ok': False, 'error_code': 400, 'description': 'Bad Request: message is not modified'
+                }).encode()
+        else:
+            result = True
+        return 200, 'application/json', json.dumps({'ok': True, 'result': result}).encode()
+
+    def store(self, chat_id: int, fields: Dict, reply_markup: Optional[str]) -> Dict:
+        """
+        Метод класса FakeTelegramApi, сохраняющий новое сообщение бота в чат
+
+        :param chat_id: int
+        :param fields: Dict
+        :param reply_markup: Optional[str]
+        :return: Dict
+        """
+        message = {
+            'message_id': next(self._message_ids), 'date': int(time.time()),
+            'chat': {'id': chat_id, 'type': 'private'},
+            'from': {'id': 1, 'is_bot': True, 'first_name': 'bench'},
+        }
+        message.update({key: value for key, value in fields.items() if value is not None})
+        if reply_markup:
+            message['reply_markup'] = json.loads(reply_markup)
+        with self._lock:
+            self.messages.setdefault(chat_id, {})[message['message_id']] = message
+        return message
+
+    def edit(self, chat_id: int, message_id: int, text: Optional[str], reply_markup: Optional[str]) -> Optional[Dict]:
+        """
+        Метод класса FakeTelegramApi, изменяющий текст, или клавиатуру сообщения. Если сообщения нет,
+        или в нём нечего менять (как в Telegram), возвращает None.
+
+        :param chat_id: int
+        :param message_id: int
+        :param text: Optional[str]
+        :param reply_markup: Optional[str]
+        :return: Optional[Dict]
+        """
+        with self._lock:
+            message = self.messages.get(chat_id, {}).get(message_id)
+            if message is None:
+                return None
+            if text is None and not reply_markup and 'reply_markup' not in message:
+                return None
+            if text is not None:
+                message['text'] = text
+            if reply_markup:
+                message['reply_markup'] = json.loads(reply_markup)
+            else:
+                message.pop('reply_markup', None)
+            return dict(message)
+
+    def last_keyboard(self, chat_id: int) -> Optional[Dict]:
+        """
+        Метод класса FakeTelegramApi, возвращающий последнее сообщение чата с inline-клавиатурой
+
+        :param chat_id: int
+        :return: Optional[Dict]
+        """
+        with self._lock:
+            for message in reversed(list(self.messages.get(chat_id, {}).values())):
+                if message.get('reply_markup', {}).get('inline_keyboard'):
+                    return dict(message)
+        return None
+
+    @staticmethod
+    def photo_sizes(media: str) -> List[Dict]:
+        """
+        Метод класса FakeTelegramApi, возвращающий размеры фотографии с file_id, производным от url
+        (повторная отправка по file_id возвращает тот же file_id)
+
+        :param media: str
+        :return: List[Dict]
+        """
+        file_id = media if not media.startswith('http') else 'file_' + hashlib.md5(media.encode()).hexdigest()
+        return [
+            {'file_id': file_id + '_s', 'file_unique_id': file_id[-8:] + 's', 'width': 90, 'height': 60},
+            {'file_id': file_id, 'file_unique_id': file_id[-8:], 'width': 1280, 'height': 853},
+        ]
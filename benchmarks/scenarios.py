@@ -0,0 +1,175 @@
+"""
+Сценарии сквозного бенчмарка (benchmarks.e2e): переписка пользователя с ботом по шагам.
+Шаг - сообщение пользователя (text), нажатие inline-кнопки (button) по её callback_data, или выбор даты
+в календаре (calendar, значение - id календаря: кнопки нажимаются, пока календарь не вернёт дату).
+Обновления передаются напрямую в настоящие обработчики (bot.process_new_updates), а кнопки берутся
+из сообщений, сохранённых заменителем Telegram, поэтому переписка идёт так же, как у пользователя.
+Модуль импортирует бота, поэтому импортируется только после настройки окружения в benchmarks.e2e.
+"""
+
+import itertools
+import time
+
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+from telebot.types import Update
+from loader import bot
+from benchmarks.fake_servers import FakeTelegramApi
+
+CALENDAR_CLICKS = 5
+update_ids = itertools.count(1)
+
+
+@dataclass
+class Step:
+    """
+    Dataclass - шаг сценария: название (для отчёта), действие (text, button, или calendar) и значение
+    """
+    name: str
+    action: str
+    value: str
+
+
+SEARCH_START = [
+    Step('city', 'text', 'new york'),
+    Step('choose_city', 'button', '1506246'),
+    Step('currency', 'button', 'USD'),
+]
+SEARCH_DATES = [
+    Step('count_hotel', 'button', 'five'),
+    Step('date_in', 'calendar', '0'),
+    Step('date_out', 'calendar', '15'),
+]
+LOWPRICE = [Step('command', 'text', '/lowprice')] + SEARCH_START + SEARCH_DATES + [
+    Step('search', 'button', 'Нет'),
+]
+LOWPRICE_PHOTO = [Step('command', 'text', '/lowprice')] + SEARCH_START + SEARCH_DATES + [
+    Step('photo', 'button', 'Да'),
+    Step('search', 'button', 'three'),
+]
+BESTDEAL = [Step('command', 'text', '/bestdeal')] + SEARCH_START + [
+    Step('price_min', 'text', '50'),
+    Step('price_max', 'text', '300'),
+    Step('distance_min', 'text', '0.5'),
+    Step('distance_max', 'text', '5'),
+] + SEARCH_DATES + [
+    Step('search', 'button', 'Нет'),
+]
+HISTORY = LOWPRICE_PHOTO + [
+    Step('history', 'text', '/history'),
+    Step('history_menu', 'button', 'Просмотреть'),
+    Step('history_recent', 'button', 'Последние действия'),
+]
+SCENARIOS: Dict[str, List[Step]] = {
+    'lowprice': LOWPRICE,
+    'lowprice_photo': LOWPRICE_PHOTO,
+    'bestdeal': BESTDEAL,
+    'history': HISTORY,
+}
+
+
+class Conversation:
+    """
+    Класс - переписка одного пользователя (отдельный чат) с ботом
+    """
+    def __init__(self, chat_id: int, telegram: FakeTelegramApi) -> None:
+        self.chat_id = chat_id
+        self.telegram = telegram
+        self.user = {'id': chat_id, 'is_bot': False, 'first_name': 'Bench', 'language_code': 'ru'}
+
+    def run(self, steps: List[Step]) -> Dict[str, float]:
+        """
+        Метод класса Conversation, выполняющий шаги сценария и возвращающий время каждого шага в секундах.
+        Если нужной кнопки нет (переписка пошла не по сценарию), выбрасывается RuntimeError.
+
+        :param steps: List[Step]
+        :return: Dict[str, float]
+        """
+        timings = {}
+        for step in steps:
+            started = time.perf_counter()
+            if step.action == 'text':
+                self.text(step.value)
+            elif step.action == 'button' and not self.button(step.value):
+                raise RuntimeError('Шаг {}: нет кнопки {}'.format(step.name, step.value))
+            elif step.action == 'calendar' and not self.calendar(step.value):
+                raise RuntimeError('Шаг {}: нет календаря {}'.format(step.name, step.value))
+            timings[step.name] = time.perf_counter() - started
+        return timings
+
+    def text(self, text: str) -> None:
+        """
+        Метод класса Conversation, отправляющий боту сообщение пользователя
+
+        :param text: str
+        :return: None
+        """
+        message = {
+            'message_id': next(update_ids), 'date': int(time.time()),
+            'chat': {'id': self.chat_id, 'type': 'private'}, 'from': self.user, 'text': text
+        }
+        if text.startswith('/'):
+            message['entities'] = [{'type': 'bot_command', 'offset': 0, 'length': len(text)}]
+        self.process({'update_id': next(update_ids), 'message': message})
+
+    def button(self, callback_data: str) -> bool:
+        """
+        Метод класса Conversation, нажимающий кнопку последней клавиатуры чата по callback_data.
+        Возвращает False, если такой кнопки нет.
+
+        :param callback_data: str
+        :return: bool
+        """
+        message = self.telegram.last_keyboard(self.chat_id)
+        if message is None or self.find_button(message, callback_data) is None:
+            return False
+        self.process({'update_id': next(update_ids), 'callback_query': {
+            'id': str(next(update_ids)), 'from': self.user, 'message': message,
+            'chat_instance': str(self.chat_id), 'data': callback_data
+        }})
+        return True
+
+    def calendar(self, calendar_id: str) -> bool:
+        """
+        Метод класса Conversation, выбирающий в календаре первые доступные год, месяц и день.
+        Возвращает False, если календаря с таким id нет.
+
+        :param calendar_id: str
+        :return: bool
+        """
+        prefix = 'cbcal_{}_s_'.format(calendar_id)
+        clicks = 0
+        while clicks < CALENDAR_CLICKS:
+            message = self.telegram.last_keyboard(self.chat_id)
+            callback_data = None if message is None else self.find_button(message, prefix, startswith=True)
+            if callback_data is None or not self.button(callback_data):
+                break
+            clicks += 1
+        return clicks > 0
+
+    @staticmethod
+    def find_button(message: Dict, callback_data: str, startswith: bool = False) -> Optional[str]:
+        """
+        Метод класса Conversation, возвращающий callback_data первой подходящей кнопки сообщения
+
+        :param message: Dict
+        :param callback_data: str
+        :param startswith: bool
+        :return: Optional[str]
+        """
+        for row in message['reply_markup']['inline_keyboard']:
+            for key in row:
+                data = key.get('callback_data', '')
+                if data == callback_data or startswith and data.startswith(callback_data):
+                    return data
+        return None
+
+    @staticmethod
+    def process(update: Dict) -> None:
+        """
+        Метод класса Conversation, передающий обновление в обработчики бота (синхронно)
+
+        :param update: Dict
+        :return: None
+        """
+        bot.process_new_updates([Update.de_json(update)])
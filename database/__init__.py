@@ -1 +1,3 @@
+from . import connection
+from . import migrations
 from . import models
@@ -0,0 +1,63 @@
+"""
+Файл с менеджером соединений к БД. Каждый поток держит одно долгоживущее соединение, для которого
+один раз при открытии применяются PRAGMA (WAL-журнал, synchronous=NORMAL, внешние ключи).
+Подготовленные выражения кэшируются самим соединением, поэтому повторные запросы не компилируются заново.
+"""
+
+import sqlite3
+import threading
+
+from contextlib import contextmanager
+from typing import Iterator
+from settings.settings import DB_PATH, DB_STATEMENT_CACHE, DB_BUSY_TIMEOUT
+
+
+class ConnectionManager:
+    """
+    Класс - менеджер потоколокальных соединений к базе данных sqlite
+    """
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._local = threading.local()
+
+    def get(self) -> sqlite3.Connection:
+        """
+        Метод класса ConnectionManager (геттер), возвращающий соединение текущего потока.
+        При первом обращении из потока открывает соединение и применяет к нему PRAGMA.
+
+        :return: sqlite3.Connection
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=DB_BUSY_TIMEOUT, cached_statements=DB_STATEMENT_CACHE)
+            conn.execute("PRAGMA journal_mode = WAL;")
+            conn.execute("PRAGMA synchronous = NORMAL;")
+            conn.execute("PRAGMA foreign_keys = ON;")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """
+        Метод класса ConnectionManager, возвращающий соединение текущего потока в виде контекстного менеджера.
+        При выходе из блока транзакция фиксируется, а в случае исключения - откатывается.
+
+        :return: Iterator[sqlite3.Connection]
+        """
+        conn = self.get()
+        with conn:
+            yield conn
+
+    def close(self) -> None:
+        """
+        Метод класса ConnectionManager, закрывающий соединение текущего потока
+
+        :return: None
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+db = ConnectionManager(DB_PATH)
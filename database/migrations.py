@@ -0,0 +1,185 @@
+"""
+Файл с версионированными миграциями схемы БД. Текущая версия схемы хранится в PRAGMA user_version.
+При запуске бота применяются только миграции с номером больше текущей версии, каждая в отдельной транзакции.
+Для изменения схемы достаточно добавить новую миграцию в конец списка MIGRATIONS. Шаг миграции - это
+SQL-выражение, либо функция, принимающая соединение (для переноса данных, который нельзя выразить в SQL).
+"""
+
+import logging
+import re
+import sqlite3
+
+from typing import Callable, List, Optional, Tuple, Union
+
+logger = logging.getLogger('bot_logger')
+
+LEGACY_CURRENCIES = {'$': 'USD', '€': 'EUR', 'RUB': 'RUB'}
+LEGACY_NUMBER = re.compile(r'\d+(?:[.,]\d+)?')
+MILE_KM = 1.609344
+
+
+def legacy_number(text: str) -> Optional[float]:
+    """
+    Функция - извлекающая первое число из строки старой записи об отеле (например, '0,7 км', или '1,234 RUB').
+    Запятая считается десятичным разделителем, только если за ней не следуют ровно три цифры.
+
+    :param text: str
+    :return: Optional[float]
+    """
+    found = LEGACY_NUMBER.search(re.sub(r',(?=\d{3}\b)', '', text))
+    if found is None:
+        return None
+    return float(found.group().replace(',', '.'))
+
+
+def convert_legacy_hotels(conn: sqlite3.Connection) -> None:
+    """
+    Функция - переносящая отели из старой таблицы (готовый Markdown-текст в hotel_info и url фото через пробел)
+    в новые таблицы с типизированными полями. Значения извлекаются из строк шаблонов HOTEL_SHOW_RU/EN
+    по их порядку. Записи, которые не удалось разобрать, пропускаются с записью в лог.
+
+    :param conn: sqlite3.Connection
+    :return: None
+    """
+    rows = conn.execute(
+        "SELECT id, user_id, command_id, hotel_info, photo FROM 'table_hotel_legacy' ORDER BY id"
+    ).fetchall()
+    for row_id, user_id, command_id, hotel_info, photo in rows:
+        values = [line.split(':*', 1)[-1].strip() for line in hotel_info.splitlines()]
+        hotel_id = re.search(r'ho(\d+)', values[-1]) if len(values) == 7 else None
+        if hotel_id is None:
+            logger.error('Не удалось перенести запись об отеле {}'.format(row_id))
+            continue
+        name, address, distance, price, _, stars, _ = values
+        distance_km = legacy_number(distance)
+        if distance_km is not None and 'mile' in distance:
+            distance_km *= MILE_KM
+        currency = LEGACY_CURRENCIES.get(price.rsplit(' ', 1)[-1], 'RUB')
+        conn.execute(
+            "INSERT INTO 'table_hotel' ("
+            "user_id, command_id, hotel_id, name, address, distance_km, price, currency, stars) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (user_id, command_id, int(hotel_id.group(1)), name, address, distance_km,
+             int(legacy_number(price) or 0), currency, legacy_number(stars))
+        )
+        conn.executemany(
+            "INSERT OR IGNORE INTO 'table_hotel_photo' (command_id, hotel_id, position, url) VALUES (?, ?, ?, ?)",
+            [(command_id, int(hotel_id.group(1)), position, url) for position, url in enumerate(photo.split())]
+        )
+
+
+MIGRATIONS: List[Tuple[int, str, Tuple[Union[str, Callable[[sqlite3.Connection], None]], ...]]] = [
+    (1, 'Таблицы команд пользователя и найденных отелей', (
+        "CREATE TABLE IF NOT EXISTS 'table_user' ("
+        "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+        "command_time TEXT NOT NULL,"
+        "user_id INTEGER NOT NULL, "
+        "command TEXT NOT NULL,"
+        "city TEXT NOT NULL,"
+        "currency TEXT NOT NULL,"
+        "date_in TEXT NOT NULL,"
+        "date_out TEXT NOT NULL,"
+        "min_distance REAL NOT NULL,"
+        "max_distance REAL NOT NULL,"
+        "price_min INTEGER NOT NULL,"
+        "price_max INTEGER NOT NULL)",
+        "CREATE TABLE IF NOT EXISTS 'table_hotel' ("
+        "id INTEGER PRIMARY KEY AUTOINCREMENT,"
+        "user_id INTEGER NOT NULL, "
+        "hotel_info TEXT NOT NULL,"
+        "photo TEXT NOT NULL,"
+        "command_id INTEGER NOT NULL,"
+        "FOREIGN KEY (command_id) REFERENCES table_user(id) ON DELETE CASCADE)",
+    )),
+    (2, 'Индексы для выборок истории по пользователю и команде', (
+        "CREATE INDEX IF NOT EXISTS 'idx_user_user_id' ON 'table_user' (user_id, id)",
+        "CREATE INDEX IF NOT EXISTS 'idx_hotel_command_id' ON 'table_hotel' (command_id)",
+        "CREATE INDEX IF NOT EXISTS 'idx_hotel_user_id' ON 'table_hotel' (user_id)",
+    )),
+    (3, 'Типизированные поля отелей вместо готового текста и отдельная таблица фотографий', (
+        "ALTER TABLE 'table_hotel' RENAME TO 'table_hotel_legacy'",
+        "DROP INDEX IF EXISTS 'idx_hotel_command_id'",
+        "DROP INDEX IF EXISTS 'idx_hotel_user_id'",
+        "CREATE TABLE 'table_hotel' ("
+        "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+        "user_id INTEGER NOT NULL, "
+        "command_id INTEGER NOT NULL, "
+        "hotel_id INTEGER NOT NULL, "
+        "name TEXT NOT NULL, "
+        "address TEXT NOT NULL, "
+        "distance_km REAL, "
+        "price INTEGER NOT NULL, "
+        "currency TEXT NOT NULL, "
+        "stars REAL, "
+        "FOREIGN KEY (command_id) REFERENCES table_user(id) ON DELETE CASCADE)",
+        "CREATE TABLE 'table_hotel_photo' ("
+        "command_id INTEGER NOT NULL, "
+        "hotel_id INTEGER NOT NULL, "
+        "position INTEGER NOT NULL, "
+        "url TEXT NOT NULL, "
+        "PRIMARY KEY (command_id, hotel_id, position), "
+        "FOREIGN KEY (command_id) REFERENCES table_user(id) ON DELETE CASCADE) WITHOUT ROWID",
+        convert_legacy_hotels,
+        "DROP TABLE 'table_hotel_legacy'",
+        "CREATE INDEX 'idx_hotel_command_id' ON 'table_hotel' (command_id)",
+        "CREATE INDEX 'idx_hotel_user_id' ON 'table_hotel' (user_id)",
+    )),
+    (4, 'Идентификаторы файлов Telegram для url фотографий', (
+        "CREATE TABLE 'table_photo_file' ("
+        "url TEXT PRIMARY KEY, "
+        "file_id TEXT NOT NULL) WITHOUT ROWID",
+    )),
+    (5, 'Таблицы сессий пользователей и кэша ответов API (раньше создавались при импорте модулей)', (
+        "CREATE TABLE IF NOT EXISTS 'table_session' ("
+        "user_id INTEGER PRIMARY KEY, "
+        "user_data BLOB NOT NULL, "
+        "last_access REAL NOT NULL)",
+        "CREATE TABLE IF NOT EXISTS 'table_cache' ("
+        "name TEXT NOT NULL, "
+        "key TEXT NOT NULL, "
+        "value TEXT NOT NULL, "
+        "expires REAL NOT NULL, "
+        "PRIMARY KEY (name, key))",
+    )),
+]
+
+
+def schema_version(conn: sqlite3.Connection) -> int:
+    """
+    Функция - возвращающая текущую версию схемы БД
+
+    :param conn: sqlite3.Connection
+    :return: int
+    """
+    version, *_ = conn.execute("PRAGMA user_version;").fetchone()
+    return version
+
+
+def migrate(conn: sqlite3.Connection) -> int:
+    """
+    Функция - применяющая к БД все ещё не применённые миграции. Каждая миграция выполняется
+    в транзакции BEGIN IMMEDIATE вместе с обновлением user_version, поэтому при любой ошибке (в том числе
+    в шаге-функции переноса данных) транзакция откатывается и схема остаётся в предыдущей версии, а параллельно запущенные экземпляры бота не применят миграцию дважды.
+    Возвращает итоговую версию схемы.
+
+    :param conn: sqlite3.Connection
+    :return: int
+    """
+    for version, description, statements in MIGRATIONS:
+        if version <= schema_version(conn):
+            continue
+        conn.execute("BEGIN IMMEDIATE;")
+        try:
+            if version > schema_version(conn):
+                for statement in statements:
+                    if callable(statement):
+                        statement(conn)
+                    else:
+                        conn.execute(statement)
+                conn.execute("PRAGMA user_version = {};".format(version))
+                logger.info('Применена миграция БД {}: {}'.format(version, description))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    return schema_version(conn)
@@ -1,8 +1,15 @@
-import sqlite3
-
-from dataclasses import dataclass
-from typing import Union, List
+import pickle
+import threading
+import time
+import metrics
+
+from dataclasses import dataclass, field
+from itertools import groupby
+from typing import Union, List, Dict, Optional, Tuple
 from telebot.types import Message, CallbackQuery
+from database import migrations
+from database.connection import db
+from settings.settings import SESSION_TTL, SESSION_STORAGE, SESSION_SWEEP_INTERVAL
 
 
 @dataclass
@@ -27,6 +34,7 @@ class User:
     max_distance: float = 0
     price_min: int = 0
     price_max: int = 0
+    command_id: int = 0
     bot_message: Union[Message, CallbackQuery] = ''
 
 
@@ -34,8 +42,10 @@ class UserHandle:
     """
     Класс - для получения, заполнения и редактирования пользовательской информации
     """
-    def __init__(self) -> None:
-        self.user: User = User()
+    def __init__(self, user_id: int = 0, storage: 'UserStorage' = None) -> None:
+        self.user: User = User(user_id=user_id)
+        self._key = user_id
+        self._storage = storage
 
     def get_tuple(self) -> tuple:
         """
@@ -78,6 +88,8 @@ class UserHandle:
         self.user.max_distance = 0
         self.user.price_min = 0
         self.user.price_max = 0
+        self.user.command_id = 0
+        self._save()
 
     def edit(self, key: str, value: Union[str, int, float]) -> None:
         """
@@ -87,20 +99,145 @@ class UserHandle:
         :return: None
         """
         self.user.__dict__[key] = value
+        self._save()
+
+    def _save(self) -> None:
+        """
+        Метод класса UserHandle, передающий изменённые данные в хранилище сессий (если оно задано)
+        :return: None
+        """
+        if self._storage is not None:
+            self._storage.save(self._key, self.user)
+
+
+class UserStorage:
+    """
+    Класс - хранилище пользовательских сессий. Для каждого пользователя (по from_user.id) хранит
+    собственный экземпляр UserHandle, чтобы одновременные диалоги не перезаписывали данные друг друга.
+    Неактивные сессии удаляются по истечении ttl. В режиме 'sqlite' сессии дополнительно сохраняются
+    в БД и переживают перезапуск бота.
+    """
+    def __init__(self, ttl: int, storage: str = 'memory') -> None:
+        self.ttl = ttl
+        self.persistent = storage == 'sqlite'
+        self._users: Dict[int, UserHandle] = {}
+        self._last_access: Dict[int, float] = {}
+        self._last_sweep = time.monotonic()
+        self._lock = threading.RLock()
+
+    def get_user(self, user_id: int) -> UserHandle:
+        """
+        Метод класса UserStorage (геттер), возвращающий сессию пользователя. Если сессии нет в памяти,
+        то она подгружается из БД (в режиме 'sqlite'), либо создаётся новая.
+
+        :param user_id: int
+        :return: UserHandle
+        """
+        with self._lock:
+            self._sweep()
+            handle = self._users.get(user_id)
+            if handle is None:
+                handle = UserHandle(user_id, storage=self)
+                if self.persistent:
+                    loaded = self._load(user_id)
+                    if loaded is not None:
+                        handle.user = loaded
+                self._users[user_id] = handle
+            self._last_access[user_id] = time.monotonic()
+            return handle
+
+    def save(self, user_id: int, user: User) -> None:
+        """
+        Метод класса UserStorage, фиксирующий изменение сессии (продлевает ttl и, в режиме 'sqlite',
+        записывает сессию в БД).
+
+        :param user_id: int
+        :param user: User
+        :return: None
+        """
+        with self._lock:
+            self._last_access[user_id] = time.monotonic()
+        if self.persistent:
+            with db.transaction() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO 'table_session' (user_id, user_data, last_access) "
+                    "VALUES (?, ?, ?)", (user_id, pickle.dumps(user), time.time())
+                )
 
+    def remove(self, user_id: int) -> None:
+        """
+        Метод класса UserStorage, удаляющий сессию пользователя
 
-user = UserHandle()
+        :param user_id: int
+        :return: None
+        """
+        with self._lock:
+            self._users.pop(user_id, None)
+            self._last_access.pop(user_id, None)
+        if self.persistent:
+            with db.transaction() as conn:
+                conn.execute("DELETE FROM 'table_session' WHERE user_id = ?", (user_id, ))
+
+    def _sweep(self) -> None:
+        """
+        Метод класса UserStorage, удаляющий сессии, к которым не обращались дольше ttl.
+        Выполняется не чаще, чем раз в SESSION_SWEEP_INTERVAL секунд.
 
+        :return: None
+        """
+        now = time.monotonic()
+        if now - self._last_sweep < SESSION_SWEEP_INTERVAL:
+            return
+        self._last_sweep = now
+        expired = [user_id for user_id, last in self._last_access.items() if now - last > self.ttl]
+        for user_id in expired:
+            self._users.pop(user_id, None)
+            self._last_access.pop(user_id, None)
+        if self.persistent:
+            with db.transaction() as conn:
+                conn.execute("DELETE FROM 'table_session' WHERE last_access < ?", (time.time() - self.ttl, ))
+
+    def _load(self, user_id: int) -> Union[User, None]:
+        """
+        Метод класса UserStorage, подгружающий сохранённую сессию из БД
 
+        :param user_id: int
+        :return: Union[User, None]
+        """
+        with db.transaction() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "SELECT user_data FROM 'table_session' WHERE user_id = ? AND last_access >= ?",
+                (user_id, time.time() - self.ttl)
+            )
+            row = cursor.fetchone()
+        if row is None:
+            return None
+        try:
+            return pickle.loads(row[0])
+        except (pickle.UnpicklingError, AttributeError, EOFError, TypeError):
+            return None
+
+
+user_storage = UserStorage(ttl=SESSION_TTL, storage=SESSION_STORAGE)
+
+
+@dataclass
 class Hotel:
     """
-    Класс для хранения информации об выведенных пользователю отелях
+    Dataclass - для хранения информации о выведенных пользователю отелях. Отель хранится в БД
+    в виде типизированных полей, а текст сообщения собирается из шаблона при показе.
     """
-    def __init__(self, user_id: int, hotel_info: str) -> None:
-        self.user_id = user_id
-        self.hotel_info = hotel_info
-        self.photo = ''
-        self.command_id = 0
+    user_id: int
+    command_id: int
+    hotel_id: int
+    name: str
+    address: str
+    distance_km: Optional[float]
+    price: int
+    currency: str
+    stars: Optional[float]
+    photos: List[str] = field(default_factory=list)
 
     def get_tuple(self) -> tuple:
         """
@@ -110,84 +247,72 @@ class Hotel:
         """
         return (
             self.user_id,
-            self.hotel_info,
-            self.photo,
             self.command_id,
+            self.hotel_id,
+            self.name,
+            self.address,
+            self.distance_km,
+            self.price,
+            self.currency,
+            self.stars
         )
 
+    def get_record(self) -> list:
+        """
+        Метод класса Hotel (геттер), возвращающий поля отеля без пользователя, команды и фотографий
+        (запись кэша ответов API)
 
-class DataBaseModel:
-    """
-    Класс, содержащий в себе методы запросов к БД
-    """
+        :return: list
+        """
+        return [self.hotel_id, self.name, self.address, self.distance_km, self.price, self.currency, self.stars]
 
     @classmethod
-    def _init_user_tables(cls) -> None:
+    def from_record(cls, record: list, user_id: int, command_id: int) -> 'Hotel':
         """
-        Класс-метод создающий базу данных и таблицу пользователя, в случае её отсутствия
+        Класс-метод создающий экземпляр Hotel из записи кэша (метод get_record)
 
-        :return: None
+        :param record: list
+        :param user_id: int
+        :param command_id: int
+        :return: Hotel
         """
-        with sqlite3.connect('hotel_database.db') as conn:
-            cursor = conn.cursor()
-            cursor.execute(
-                "SELECT name FROM 'sqlite_master' "
-                "WHERE type='table' AND name='table_user';"
-            )
-            exists = cursor.fetchone()
-            if not exists:
-                cursor.executescript(
-                    "CREATE TABLE 'table_user' ("
-                    "id INTEGER PRIMARY KEY AUTOINCREMENT, "
-                    "command_time TEXT NOT NULL,"
-                    "user_id INTEGER NOT NULL, "
-                    "command TEXT NOT NULL,"
-                    "city TEXT NOT NULL,"
-                    "currency TEXT NOT NULL,"
-                    "date_in TEXT NOT NULL,"
-                    "date_out TEXT NOT NULL,"
-                    "min_distance REAL NOT NULL,"
-                    "max_distance REAL NOT NULL,"
-                    "price_min INTEGER NOT NULL,"
-                    "price_max INTEGER NOT NULL)"
-                )
-        cls._init_hotel_tables()
+        return cls(user_id, command_id, *record)
 
+    def get_photo_tuples(self) -> List[tuple]:
+        """
+        Метод класса Hotel (геттер), возвращающий кортежи фотографий отеля, необходимые для записи в БД
+
+        :return: List[tuple]
+        """
+        return [(self.command_id, self.hotel_id, position, url) for position, url in enumerate(self.photos)]
+
+
+class DataBaseModel:
+    """
+    Класс, содержащий в себе методы запросов к БД
+    """
     @classmethod
-    def _init_hotel_tables(cls) -> None:
+    @metrics.timed('db')
+    def migrate(cls) -> int:
         """
-        Класс-метод создающий базу данных и таблицу отелей, в случае её отсутствия
+        Класс-метод создающий базу данных и применяющий к ней не применённые миграции схемы.
+        Возвращает итоговую версию схемы.
 
-        :return: None
+        :return: int
         """
-        with sqlite3.connect('hotel_database.db') as conn:
-            cursor = conn.cursor()
-            cursor.execute(
-                "SELECT name FROM 'sqlite_master' "
-                "WHERE type='table' AND name='table_hotel';"
-            )
-            exists = cursor.fetchone()
-            if not exists:
-                cursor.executescript(
-                    "CREATE TABLE 'table_hotel' ("
-                    "id INTEGER PRIMARY KEY AUTOINCREMENT,"
-                    "user_id INTEGER NOT NULL, "
-                    "hotel_info TEXT NOT NULL,"
-                    "photo TEXT NOT NULL,"
-                    "command_id INTEGER NOT NULL,"
-                    "FOREIGN KEY (command_id) REFERENCES table_user(id) ON DELETE CASCADE)"
-                )
-            cursor.executescript("PRAGMA foreign_keys = ON;")
+        return migrations.migrate(db.get())
 
     @classmethod
-    def insert_user(cls, user_tuple: tuple) -> None:
+    @metrics.timed('db')
+    def insert_user(cls, user_tuple: tuple) -> int:
         """
-        Класс-метод записывающий данные пользователя в БД
+        Класс-метод записывающий данные пользователя в БД. Возвращает id созданной записи команды,
+        который затем используется как command_id у найденных отелей.
 
         :param user_tuple: tuple
-        :return: None
+        :return: int
         """
-        with sqlite3.connect('hotel_database.db') as conn:
+        with db.transaction() as conn:
             cursor = conn.cursor()
             cursor.execute(
                 "INSERT INTO 'table_user' ("
@@ -195,92 +320,135 @@ class DataBaseModel:
                 "date_out, min_distance, max_distance, price_min, price_max) "
                 "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", user_tuple
             )
+            return cursor.lastrowid
 
     @classmethod
-    def insert_hotel(cls, user_hotel: Hotel) -> None:
+    @metrics.timed('db')
+    def insert_hotels(cls, user_hotels: List[Hotel]) -> None:
         """
-        Класс-метод записывающий данные отеля в БД
+        Класс-метод записывающий в БД все отели одного поиска и их фотографии одной транзакцией
 
-        :param user_hotel: Hotel
+        :param user_hotels: List[Hotel]
         :return: None
         """
-        with sqlite3.connect('hotel_database.db') as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT id FROM 'table_user' "
-                           "WHERE user_id = {} ORDER BY id DESC ".format(user.user.user_id))
-            command_id, *_ = cursor.fetchone()
-            user_hotel.command_id = command_id
-            cursor.execute(
+        if not user_hotels:
+            return
+        with db.transaction() as conn:
+            conn.executemany(
                 "INSERT INTO 'table_hotel' ("
-                "user_id, hotel_info, photo, command_id) "
-                "VALUES (?, ?, ?, ?)", user_hotel.get_tuple()
+                "user_id, command_id, hotel_id, name, address, distance_km, price, currency, stars) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", [user_hotel.get_tuple() for user_hotel in user_hotels]
+            )
+            conn.executemany(
+                "INSERT OR IGNORE INTO 'table_hotel_photo' (command_id, hotel_id, position, url) "
+                "VALUES (?, ?, ?, ?)",
+                [photo for user_hotel in user_hotels for photo in user_hotel.get_photo_tuples()]
             )
 
     @classmethod
-    def delete_history(cls, history_user: int) -> None:
+    @metrics.timed('db')
+    def select_file_ids(cls, urls: List[str]) -> Dict[str, str]:
         """
-        Класс-метод удаляющий из базы данных записи текущего пользователя
+        Класс-метод возвращающий из базы данных сохранённые идентификаторы файлов Telegram для url фотографий
 
-        :param history_user: int
-        :return: None
+        :param urls: List[str]
+        :return: Dict[str, str]
         """
-        with sqlite3.connect('hotel_database.db') as conn:
+        if not urls:
+            return {}
+        with db.transaction() as conn:
             cursor = conn.cursor()
             cursor.execute(
-                "DELETE FROM 'table_user' WHERE user_id = ?;", (history_user, )
-            )
-            cursor.execute(
-                "DELETE FROM 'table_hotel' WHERE user_id = ?;", (history_user,)
+                "SELECT url, file_id FROM 'table_photo_file' WHERE url IN ({})".format(', '.join('?' * len(urls))),
+                urls
             )
+            return dict(cursor.fetchall())
 
     @classmethod
-    def select_history_user(cls, history_user: int) -> List[tuple]:
+    @metrics.timed('db')
+    def insert_file_ids(cls, file_ids: Dict[str, str]) -> None:
         """
-        Класс-метод возвращающий из базы данных список кортежей с информацией по пользователю.
+        Класс-метод записывающий в БД идентификаторы файлов Telegram для url фотографий
 
-        :param history_user: int
-        :return: List[tuple]
+        :param file_ids: Dict[str, str]
+        :return: None
         """
-        with sqlite3.connect('hotel_database.db') as conn:
-            cursor = conn.cursor()
-            cursor.execute(
-                "SELECT id, command_time, command, city, date_in, date_out "
-                "FROM 'table_user' WHERE user_id = ?", (history_user, )
+        if not file_ids:
+            return
+        with db.transaction() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO 'table_photo_file' (url, file_id) VALUES (?, ?)", file_ids.items()
             )
-            user_command = cursor.fetchall()
-            return user_command
 
     @classmethod
-    def select_history_user_five(cls, history_user: int) -> List[tuple]:
+    @metrics.timed('db')
+    def delete_file_ids(cls, urls: List[str]) -> None:
         """
-        Класс-метод возвращающий из базы данных список кортежей с информацией по пользователю,
-        отсортированной в обратном порядке для вывода последних пяти записей.
+        Класс-метод удаляющий из БД идентификаторы файлов Telegram, которые Telegram больше не принимает
+
+        :param urls: List[str]
+        :return: None
+        """
+        with db.transaction() as conn:
+            conn.executemany("DELETE FROM 'table_photo_file' WHERE url = ?", [(url, ) for url in urls])
+
+    @classmethod
+    @metrics.timed('db')
+    def delete_history(cls, history_user: int) -> None:
+        """
+        Класс-метод удаляющий из базы данных записи текущего пользователя
 
         :param history_user: int
-        :return: List[tuple]
+        :return: None
         """
-        with sqlite3.connect('hotel_database.db') as conn:
+        with db.transaction() as conn:
             cursor = conn.cursor()
             cursor.execute(
-                "SELECT id, command_time, command, city, date_in, date_out "
-                "FROM 'table_user' WHERE user_id = ? ORDER BY id DESC ", (history_user, )
+                "DELETE FROM 'table_user' WHERE user_id = ?;", (history_user, )
+            )
+            cursor.execute(
+                "DELETE FROM 'table_hotel' WHERE user_id = ?;", (history_user,)
             )
-            user_command = cursor.fetchall()
-            return user_command
 
     @classmethod
-    def select_history_hotel(cls, history_id: int) -> List[tuple]:
+    @metrics.timed('db')
+    def select_recent_commands(cls, history_user: int, limit: int,
+                               before_id: Optional[int] = None) -> List[Tuple[tuple, List[Hotel]]]:
         """
-        Класс-метод возвращающий из базы данных список кортежей с информацией по отелям,
-        запрошенным ранее пользователем
+        Класс-метод возвращающий из базы данных не более limit последних команд пользователя (от новых к старым)
+        вместе с отелями по ним, одним запросом. Если задан before_id, то возвращаются команды, предшествующие ему
+        (keyset-пагинация). Сортировка и ограничение выполняются в самом запросе по индексу (user_id, id),
+        команды соединяются с отелями, а url фотографий каждого отеля собираются подзапросом.
+        Каждый элемент списка - кортеж команды и список отелей (Hotel) по этой команде.
 
-        :param history_id: int
-        :return: List[tuple]
+        :param history_user: int
+        :param limit: int
+        :param before_id: Optional[int]
+        :return: List[Tuple[tuple, List[Hotel]]]
         """
-        with sqlite3.connect('hotel_database.db') as conn:
+        with db.transaction() as conn:
             cursor = conn.cursor()
             cursor.execute(
-                "SELECT hotel_info, photo "
-                "FROM 'table_hotel' WHERE command_id = ?", (history_id, ))
-            user_hotels = cursor.fetchall()
-            return user_hotels
+                "SELECT command.id, command.command_time, command.command, command.city, "
+                "command.date_in, command.date_out, hotel.hotel_id, hotel.name, hotel.address, "
+                "hotel.distance_km, hotel.price, hotel.currency, hotel.stars, ("
+                "SELECT group_concat(url, ' ') FROM ("
+                "SELECT url FROM 'table_hotel_photo' AS photo "
+                "WHERE photo.command_id = hotel.command_id AND photo.hotel_id = hotel.hotel_id "
+                "ORDER BY photo.position)) "
+                "FROM ("
+                "SELECT id, command_time, command, city, date_in, date_out FROM 'table_user' "
+                "WHERE user_id = ? AND (? IS NULL OR id < ?) ORDER BY id DESC LIMIT ?) AS command "
+                "LEFT JOIN 'table_hotel' AS hotel ON hotel.command_id = command.id "
+                "ORDER BY command.id DESC, hotel.id",
+                (history_user, before_id, before_id, limit)
+            )
+            rows = cursor.fetchall()
+        history = []
+        for user_command, command_rows in groupby(rows, key=lambda row: row[:6]):
+            hotels = [
+                Hotel(history_user, user_command[0], *row[6:13], photos=row[13].split() if row[13] else [])
+                for row in command_rows if row[6] is not None
+            ]
+            history.append((user_command, hotels))
+        return history
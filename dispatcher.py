@@ -0,0 +1,178 @@
+"""
+Файл с распределением обновлений по пулу потоков-обработчиков (BOT_RUNTIME = 'sharded').
+Каждый чат закреплён за одним потоком (по хэшу id чата), у каждого потока своя очередь, поэтому
+обновления одного чата обрабатываются строго по очереди, а разные чаты - параллельно.
+Медленный поиск одного пользователя занимает только свой поток. Глубина очередей и время занятости
+потоков доступны через метод Dispatcher.stats() и в метриках (metrics).
+"""
+
+import metrics
+import queue
+import threading
+import time
+
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from telebot.types import Update
+from loader import bot, logger
+from settings.settings import DISPATCH_WORKERS, POLL_TIMEOUT, POLL_RETRY_DELAY
+
+
+def update_chat_id(update: Update) -> Optional[int]:
+    """
+    Функция - возвращающая id чата, к которому относится обновление
+
+    :param update: Update
+    :return: Optional[int]
+    """
+    if update.message is not None:
+        return update.message.chat.id
+    if update.edited_message is not None:
+        return update.edited_message.chat.id
+    if update.callback_query is not None:
+        return update.callback_query.from_user.id
+    return None
+
+
+class ChatWorker(threading.Thread):
+    """
+    Дочерний Класс (Родитель - Thread). Поток, обрабатывающий обновления закреплённых за ним чатов
+    из собственной очереди и учитывающий время своей занятости.
+    """
+    def __init__(self, index: int) -> None:
+        super().__init__(name='dispatch-{}'.format(index), daemon=True)
+        self.index = index
+        self.updates: queue.Queue = queue.Queue()
+        self.processed = 0
+        self.busy_seconds = 0.0
+        self.busy_since: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def run(self) -> None:
+        """
+        Метод класса ChatWorker, обрабатывающий обновления из очереди по одному
+
+        :return: None
+        """
+        while True:
+            update = self.updates.get()
+            started = time.monotonic()
+            with self._lock:
+                self.busy_since = started
+            try:
+                bot.process_new_updates([update])
+            except Exception as error:
+                logger.error('В работе бота возникло исключение', exc_info=error)
+            finally:
+                with self._lock:
+                    self.busy_since = None
+                    self.busy_seconds += time.monotonic() - started
+                    self.processed += 1
+                self.updates.task_done()
+
+    def stats(self) -> Dict:
+        """
+        Метод класса ChatWorker, возвращающий глубину очереди, количество обработанных обновлений
+        и суммарное время занятости потока (включая текущее обновление)
+
+        :return: Dict
+        """
+        with self._lock:
+            busy_seconds = self.busy_seconds
+            if self.busy_since is not None:
+                busy_seconds += time.monotonic() - self.busy_since
+            return {
+                'worker': self.index,
+                'queue_depth': self.updates.qsize(),
+                'processed': self.processed,
+                'busy': self.busy_since is not None,
+                'busy_seconds': busy_seconds,
+            }
+
+
+class Dispatcher:
+    """
+    Класс - пул потоков-обработчиков, распределяющий обновления по id чата
+    """
+    def __init__(self, workers: int = DISPATCH_WORKERS) -> None:
+        self.workers = [ChatWorker(index) for index in range(max(workers, 1))]
+        self._started = False
+
+    def start(self) -> None:
+        """
+        Метод класса Dispatcher, запускающий потоки-обработчики (повторный вызов ничего не делает)
+
+        :return: None
+        """
+        if not self._started:
+            self._started = True
+            for worker in self.workers:
+                worker.start()
+
+    def worker_for(self, update: Update) -> ChatWorker:
+        """
+        Метод класса Dispatcher, возвращающий поток, за которым закреплён чат обновления.
+        Обновления без чата распределяются по update_id.
+
+        :param update: Update
+        :return: ChatWorker
+        """
+        chat_id = update_chat_id(update)
+        key = update.update_id if chat_id is None else chat_id
+        return self.workers[hash(key) % len(self.workers)]
+
+    def dispatch(self, updates: List[Update]) -> None:
+        """
+        Метод класса Dispatcher, передающий обновления в очереди закреплённых за их чатами потоков
+
+        :param updates: List[Update]
+        :return: None
+        """
+        for update in updates:
+            self.worker_for(update).updates.put(update)
+
+    def stats(self) -> List[Dict]:
+        """
+        Метод класса Dispatcher, возвращающий статистику всех потоков-обработчиков
+
+        :return: List[Dict]
+        """
+        return [worker.stats() for worker in self.workers]
+
+    def poll(self) -> None:
+        """
+        Метод класса Dispatcher, запускающий бесконечный цикл получения обновлений (long polling).
+        При ошибке запроса повторяет его через POLL_RETRY_DELAY секунд.
+
+        :return: None
+        """
+        self.start()
+        offset = None
+        logger.info('bot start working (sharded, {} workers)'.format(len(self.workers)))
+        while True:
+            try:
+                updates = bot.get_updates(offset=offset, timeout=POLL_TIMEOUT, long_polling_timeout=POLL_TIMEOUT)
+            except Exception as error:
+                logger.error('Ошибка получения обновлений', exc_info=error)
+                time.sleep(POLL_RETRY_DELAY)
+                continue
+            if updates:
+                offset = updates[-1].update_id + 1
+                self.dispatch(updates)
+
+
+def dispatcher_metrics() -> Iterator[Tuple[str, str, Dict[str, Any], float]]:
+    """
+    Функция - сборщик метрик пула потоков-обработчиков: глубина очереди, время занятости
+    и количество обработанных обновлений каждого потока
+
+    :return: Iterator[Tuple[str, str, Dict[str, Any], float]]
+    """
+    for stats in dispatcher.stats():
+        labels = {'worker': stats['worker']}
+        yield 'bot_dispatch_queue_depth', 'gauge', labels, stats['queue_depth']
+        yield 'bot_dispatch_busy_seconds_total', 'counter', labels, stats['busy_seconds']
+        yield 'bot_dispatch_processed_total', 'counter', labels, stats['processed']
+
+
+dispatcher = Dispatcher()
+metrics.registry.register_collector(dispatcher_metrics)
@@ -1,15 +1,15 @@
 import re
-import json
-import settings.settings
 
-
-from typing import List, Dict, Union
+from itertools import islice
+from typing import List, Optional, Union
 from telebot.types import Message, CallbackQuery
-from database.models import user
+from api_requests import client
+from database.models import user_storage, Hotel
 from loader import bot, logger, exception_handler
 from settings import constants
-from api_requests.request_api import request_bestdeal
-from .lowprice_highprice import count_hotel
+from settings.settings import BESTDEAL_MAX_PAGES, BESTDEAL_FANOUT
+from .lowprice_highprice import count_hotel, fetch_hotels
+from .ranking import HotelColumns, rank_hotels
 from .start_help import start_command
 
 
@@ -23,6 +23,7 @@ def price_min(message: Message) -> None:
     :return: None
     """
     logger.info(str(message.from_user.id))
+    user = user_storage.get_user(message.from_user.id)
     if message.text in constants.COMMAND_LIST:
         start_command(message)
     else:
@@ -51,6 +52,7 @@ def price_max(message: Message) -> None:
     :return: None
     """
     logger.info(str(message.from_user.id))
+    user = user_storage.get_user(message.from_user.id)
     if message.text in constants.COMMAND_LIST:
         start_command(message)
     else:
@@ -86,6 +88,7 @@ def distance_min(message: Message) -> None:
     :return: None
     """
     logger.info(str(message.from_user.id))
+    user = user_storage.get_user(message.from_user.id)
     if message.text in constants.COMMAND_LIST:
         start_command(message)
     else:
@@ -117,6 +120,7 @@ def distance_max(message: Message) -> None:
     :return: None
     """
     logger.info(str(message.from_user.id))
+    user = user_storage.get_user(message.from_user.id)
     if message.text in constants.COMMAND_LIST:
         start_command(message)
     else:
@@ -160,6 +164,7 @@ def check_distance(message) -> None:
     :return: None
     """
     logger.info(str(message.from_user.id))
+    user = user_storage.get_user(message.from_user.id)
     if user.user.min_distance >= user.user.max_distance:
         bot.send_message(message.from_user.id, constants.INCORRECT_VALUE_DISTANCE)
         bot.send_message(message.from_user.id, constants.MAX_DISTANCE)
@@ -173,47 +178,63 @@ def check_distance(message) -> None:
 
 
 @exception_handler
-def bestdeal_logic(call: CallbackQuery, result_hotels: List[Dict], result: List) -> Union[List[Dict], bool]:
+def fetch_page(call: CallbackQuery, page_number: int) -> Optional[List[Hotel]]:
     """
-    Функция - обрабатывающая десериализованный ответ с API. Проходит циклом по отелям и подбирает
-    отель с подходящей удаленностью от центра. В случае, если не набралось необходимое количество отелей
-    (Пользовательский выбор + 5 отелей запасных, в случае возникновения ошибок), то обращаемся к функции
-    bestdeal_additional_request, для повторного запроса на следующей странице. Чтобы пользователь долго не ожидал
-    инофрмацию, к API делается ещё два дополнительных запроса по отелям, если они не набирается необходимое
-    количество отелей, то пользователь получает сообщение, что отели не найдены.
+    Функция - выполняемая в пуле потоков. Получает страницу выдачи в функции fetch_hotels (кэш, или запрос к API)
+    и дочитывает её целиком. Если запрос завершился ошибкой, возвращает None.
 
     :param call: CallbackQuery
-    :param result_hotels: List[Dict]
-    :param result: List
-    :return: Union [List[Dict], bool]
+    :param page_number: int
+    :return: Optional[List[Hotel]]
     """
     logger.info(str(call.from_user.id))
-    for hotel in result_hotels:
-        distance = re.sub(r'[\D+]', '', hotel['landmarks'][0]['distance'])
-        if user.user.min_distance <= int(distance) <= user.user.max_distance:
-            result.append(hotel)
-    if len(result) < user.user.count_hotel + 5:
-        settings.settings.QUERY_BESTDEAL['pageNumber'] = int(settings.settings.QUERY_BESTDEAL['pageNumber']) + 1
-        if settings.settings.QUERY_BESTDEAL['pageNumber'] == 4:
-            return False
-        else:
-            bestdeal_additional_request(call, result)
-    elif len(result) >= user.user.count_hotel + 5:
-        settings.settings.QUERY_BESTDEAL['pageNumber'] = 1
-        return result
+    result_hotels = fetch_hotels(call, page_number)
+    if result_hotels is None:
+        return None
+    return list(result_hotels)
 
 
-@exception_handler
-def bestdeal_additional_request(call: CallbackQuery, result) -> None:
+def bestdeal_hotels(call: CallbackQuery) -> Union[List[Hotel], bool, None]:
     """
-    Функция - обращается к файлу request_api, функции request_bestdeal.
-    Полученный ответ от API, отправляет в bestdeal_logic
+    Функция - собирающая отели для команды bestdeal со страниц выдачи API (не более BESTDEAL_MAX_PAGES).
+    Одновременно запрашивается до BESTDEAL_FANOUT страниц, каждая следующая страница запрашивается,
+    как только освобождается место. Страницы по мере готовности (в порядке номеров страниц) разбираются
+    в столбцы (файл 'ranking') и фильтруются по диапазонам расстояния и цены. Как только набирается
+    необходимое количество отелей (Пользовательский выбор + 5 отелей запасных, в случае возникновения ошибок),
+    ещё не начатые запросы отменяются, а отобранные отели ранжируются по цене, удалённости и звёздам. Если отели не набрались, или запрос дополнительной страницы завершился ошибкой, то возвращает False.
+    Если ошибкой завершился запрос первой страницы, то возвращает None.
 
     :param call: CallbackQuery
-    :param result: List[Dict]
-    :return: None
+    :return: Union[List[Hotel], bool, None]
     """
     logger.info(str(call.from_user.id))
-    response_hotels = request_bestdeal(call)
-    result_hotels = json.loads(response_hotels.text)['data']['body']['searchResults']['results']
-    bestdeal_logic(call, result_hotels, result)
+    user = user_storage.get_user(call.from_user.id)
+    pages = iter(range(1, BESTDEAL_MAX_PAGES + 1))
+    futures = {
+        page_number: client.request_executor.submit(fetch_page, call, page_number)
+        for page_number in islice(pages, max(BESTDEAL_FANOUT, 1))
+    }
+    columns = HotelColumns()
+    selected = 0
+    try:
+        for page_number in range(1, BESTDEAL_MAX_PAGES + 1):
+            result_hotels = futures.pop(page_number).result()
+            if result_hotels is None:
+                return None if page_number == 1 else False
+            next_page = next(pages, None)
+            if next_page is not None:
+                futures[next_page] = client.request_executor.submit(fetch_page, call, next_page)
+            start = len(columns.hotels)
+            columns.extend(result_hotels)
+            selected += sum(columns.mask(
+                user.user.min_distance, user.user.max_distance, user.user.price_min, user.user.price_max, start
+            ))
+            if selected >= user.user.count_hotel + 5:
+                return rank_hotels(
+                    columns, user.user.min_distance, user.user.max_distance,
+                    user.user.price_min, user.user.price_max, user.user.count_hotel + 5
+                )
+        return False
+    finally:
+        for future in futures.values():
+            future.cancel()
@@ -1,14 +1,15 @@
-import string
-import requests
-
-from typing import Union, List
-from telebot.types import Message, InputMediaPhoto, CallbackQuery
-from database.models import DataBaseModel, user
+from typing import Dict, Union, List, Optional, Tuple
+from telebot.types import Message, CallbackQuery
+from api_requests import client
+from database.models import DataBaseModel, Hotel, user_storage
 from keyboards.keyboards import keyboard_commands
 from loader import bot, exception_handler
 from settings import constants
+from settings.settings import HISTORY_PAGE_SIZE, HISTORY_RECENT_SIZE
 from keyboards import keyboards, keyboards_text
 from main import logger
+from .media import send_hotel_photos
+from .rendering import history_locale, period_days, render_hotel
 
 
 def history_menu(message: Union[Message, CallbackQuery]) -> None:
@@ -20,6 +21,7 @@ def history_menu(message: Union[Message, CallbackQuery]) -> None:
     :return: None
     """
     logger.info(str(message.from_user.id))
+    user = user_storage.get_user(message.from_user.id)
     if isinstance(message, Message):
         message_text = message.text
     else:
@@ -42,6 +44,7 @@ def callback_history_menu(call: CallbackQuery) -> None:
     :return: None
     """
     logger.info(str(call.from_user.id))
+    user = user_storage.get_user(call.from_user.id)
     bot.edit_message_reply_markup(call.message.chat.id, call.message.message_id)
     if call.data == keyboards_text.HISTORY_LIST[0]:
         bot_message = bot.send_message(
@@ -62,64 +65,118 @@ def callback_history_menu(call: CallbackQuery) -> None:
 def callback_history_showing(call: CallbackQuery) -> None:
     """
     Функция - обработчик inline-кнопок. Реагирует только на команды из списка HISTORY_SHOW_LIST.
-    Исходя из выбранного варианта, делает запрос к БД, и с полученным ответом перенаправляет в функцию
-    history_showing. Если ответ пуст, то сообщает пользователю, что история пуста.
+    В случае выбора полной истории, выводит её первую страницу (функция history_page).
+    В случае выбора последних действий, одним запросом к БД получает последние HISTORY_RECENT_SIZE команд с отелями
+    и перенаправляет в функцию history_showing. Если ответ пуст, то сообщает пользователю, что история пуста.
 
     :param call: CallbackQuery
     :return: None
     """
     logger.info(str(call.from_user.id))
+    user = user_storage.get_user(call.from_user.id)
     bot.edit_message_reply_markup(call.message.chat.id, call.message.message_id)
     if call.data == keyboards_text.HISTORY_SHOW_LIST[0]:
-        user_command = DataBaseModel.select_history_user(call.from_user.id)
-        if user_command:
-            history_showing(call, user_command)
+        history_page(call, before_id=None)
+    else:
+        user_history = DataBaseModel.select_recent_commands(call.from_user.id, HISTORY_RECENT_SIZE)
+        if user_history:
+            user_history.reverse()
+            history_showing(call, user_history)
+            history_complete(call)
         else:
             bot.send_message(call.from_user.id, constants.HISTORY_EMPTY)
             bot_message = bot.send_message(
                 call.from_user.id, constants.HELP_MESSAGE, reply_markup=keyboard_commands(call.data)
             )
             user.edit('bot_message', bot_message)
-    else:
-        user_command = DataBaseModel.select_history_user_five(call.from_user.id)
-        if user_command:
-            if len(user_command) > 5:
-                user_command = user_command[:5]
-            user_command.reverse()
-            history_showing(call, user_command)
-        else:
-            bot.send_message(call.from_user.id, constants.HISTORY_EMPTY)
+
+
+@bot.callback_query_handler(func=lambda call: call.data.startswith(keyboards_text.HISTORY_PAGE))
+@exception_handler
+def callback_history_page(call: CallbackQuery) -> None:
+    """
+    Функция - обработчик inline-кнопки перехода к следующей странице полной истории.
+    Из callback_data получает id последней показанной команды и выводит следующую страницу.
+
+    :param call: CallbackQuery
+    :return: None
+    """
+    logger.info(str(call.from_user.id))
+    bot.edit_message_reply_markup(call.message.chat.id, call.message.message_id)
+    history_page(call, before_id=int(call.data[len(keyboards_text.HISTORY_PAGE):]))
+
+
+def history_page(call: CallbackQuery, before_id: Optional[int]) -> None:
+    """
+    Функция - выводящая страницу полной истории (HISTORY_PAGE_SIZE команд, предшествующих before_id).
+    Команды с отелями получаются из БД одним запросом. Если после страницы остались более ранние команды,
+    то предлагает пользователю inline-кнопку для перехода к следующей странице.
+
+    :param call: CallbackQuery
+    :param before_id: Optional[int]
+    :return: None
+    """
+    logger.info(str(call.from_user.id))
+    user = user_storage.get_user(call.from_user.id)
+    user_history = DataBaseModel.select_recent_commands(call.from_user.id, HISTORY_PAGE_SIZE + 1, before_id)
+    if user_history:
+        page = user_history[:HISTORY_PAGE_SIZE]
+        history_showing(call, page)
+        if len(user_history) > HISTORY_PAGE_SIZE:
             bot_message = bot.send_message(
-                call.from_user.id, constants.HELP_MESSAGE, reply_markup=keyboard_commands(call.data)
+                call.from_user.id, constants.HISTORY_NEXT_PAGE,
+                reply_markup=keyboards.keyboard_history_page(page[-1][0][0], HISTORY_PAGE_SIZE)
             )
             user.edit('bot_message', bot_message)
+        else:
+            history_complete(call)
+    else:
+        bot.send_message(call.from_user.id, constants.HISTORY_EMPTY)
+        bot_message = bot.send_message(
+            call.from_user.id, constants.HELP_MESSAGE, reply_markup=keyboard_commands(call.data)
+        )
+        user.edit('bot_message', bot_message)
 
 
 @exception_handler
-def history_showing(call: CallbackQuery, user_command: List[tuple]) -> None:
+def history_showing(call: CallbackQuery, user_history: List[Tuple[tuple, List[Hotel]]]) -> None:
     """
     Функция - обрабатывает ответ с БД и циклом выводит пользователю шаблон с данными о команде.
     Сам шаблон в зависимости от языка запроса получаем из функции locale_history.
-    На каждой итерации делает запрос к БД, для получения истории найденных отелей. Если отели найдены,
+    Отели по каждой команде уже получены тем же запросом к БД. Если отели найдены,
     то направляется в функцию history_hotels_show. В противном случае, сообщает пользователю,
-    что по данной команде не были найдены отели.
+    что по данной команде не были найдены отели. Доступность фотографий всех отелей страницы проверяется
+    одним вызовом client.check_urls до начала вывода. Вывод истории идёт в очереди отправки как массовый (bot.bulk()).
 
     :param call: CallbackQuery
-    :param user_command: List[tuple]
+    :param user_history: List[Tuple[tuple, List[Hotel]]]
     :return: None
     """
     logger.info(str(call.from_user.id))
-    for command in user_command:
-        history_template = locale_history(call, command[3])
-        bot.send_message(call.from_user.id, history_template.format(
-            command[1], command[2], command[3], command[4], command[5])
-                         )
-        hotels = DataBaseModel.select_history_hotel(command[0])
-        if hotels:
-            for hotel in hotels:
-                history_hotels_show(call, hotel)
-        else:
-            bot.send_message(call.from_user.id, constants.HISTORY_EMPTY_HOTELS)
+    photos = list(dict.fromkeys(photo for _, hotels in user_history for hotel in hotels for photo in hotel.photos))
+    photo_statuses = dict(zip(photos, client.check_urls(photos)))
+    with bot.bulk():
+        for command, hotels in user_history:
+            history_template = locale_history(call, command[3])
+            bot.send_message(call.from_user.id, history_template.format(
+                command[1], command[2], command[3], command[4], command[5])
+                             )
+            if hotels:
+                days = period_days(command[4], command[5])
+                for hotel in hotels:
+                    history_hotels_show(call, hotel, days, history_locale(command[3]), photo_statuses)
+            else:
+                bot.send_message(call.from_user.id, constants.HISTORY_EMPTY_HOTELS)
+
+
+def history_complete(call: CallbackQuery) -> None:
+    """
+    Функция - сообщающая пользователю о завершении показа истории и выводящая меню команд
+
+    :param call: CallbackQuery
+    :return: None
+    """
+    user = user_storage.get_user(call.from_user.id)
     bot.send_message(call.from_user.id, constants.HISTORY_COMPLETE)
     bot_message = bot.send_message(
         call.from_user.id, constants.HELP_MESSAGE, reply_markup=keyboard_commands(call.data)
@@ -128,32 +185,28 @@ def history_showing(call: CallbackQuery, user_command: List[tuple]) -> None:
 
 
 @exception_handler
-def history_hotels_show(call: CallbackQuery, hotel: tuple) -> None:
+def history_hotels_show(call: CallbackQuery, hotel: Hotel, days: int, locale: str,
+                        photo_statuses: Dict[str, bool]) -> None:
     """
-    Функция - обрабатывающая кортеж с данными об отеле и выводящий пользователя информацию о найденном отеле.
-    Если в БД хранились url фото, то выводит сообщение пользователю медиагруппой, с фотографиями.
+    Функция - выводящая пользователю информацию о найденном ранее отеле. Текст сообщения собирается
+    из сохранённых полей отеля в функции render_hotel. Если в БД хранились url фото, то выводит сообщение
+    пользователю медиагруппой с доступными фотографиями (photo_statuses - результаты проверки url всей страницы
+    истории, ранее отправленные фотографии передаются по file_id).
 
     :param call: CallbackQuery
-    :param hotel: tuple
+    :param hotel: Hotel
+    :param days: int
+    :param locale: str
+    :param photo_statuses: Dict[str, bool]
     :return: None
     """
     logger.info(str(call.from_user.id))
-    if hotel[1] != '':
-        photo_list = hotel[1].split()
-        media_massive = []
-        index = 0
-        for photo in photo_list:
-            response = requests.get(photo)
-            if str(response.status_code).startswith('2'):
-                index += 1
-                media_massive.append(
-                    InputMediaPhoto(photo, caption=hotel[0] if index == 1 else '', parse_mode='Markdown')
-                )
-            else:
-                logger.error('Ошибка запроса', exc_info=response.status_code)
-        bot.send_media_group(call.from_user.id, media=media_massive)
+    hotel_show = render_hotel(hotel, days, locale)
+    valid_photos = [photo for photo in hotel.photos if photo_statuses.get(photo)]
+    if valid_photos:
+        send_hotel_photos(call.from_user.id, valid_photos, hotel_show)
     else:
-        bot.send_message(call.from_user.id, hotel[0])
+        bot.send_message(call.from_user.id, hotel_show)
 
 
 def locale_history(call: CallbackQuery, city: str) -> str:
@@ -166,7 +219,6 @@ def locale_history(call: CallbackQuery, city: str) -> str:
     :return: str
     """
     logger.info(str(call.from_user.id))
-    for sym in city:
-        if sym not in string.printable:
-            return constants.HISTORY_COMMAND_RU
+    if history_locale(city) == 'ru_RU':
+        return constants.HISTORY_COMMAND_RU
     return constants.HISTORY_COMMAND_EN
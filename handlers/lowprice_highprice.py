@@ -1,19 +1,23 @@
 import json
-import re
-import requests
 
-from typing import Union, Any, Dict, Optional, List, Tuple
+from itertools import islice
+from typing import Union, Iterable, Optional, List
 from requests.models import Response
 from datetime import datetime
 from keyboards.keyboards import keyboard_commands
 from loader import bot, logger, exception_handler
-from database.models import user, DataBaseModel, Hotel
+from database.models import user_storage, DataBaseModel, Hotel
 from settings import constants
-from settings import settings
 from . import bestdeal
+from api_requests import client
+from api_requests.cache import city_cache, property_cache
+from api_requests.parsers import parse_city_list, parse_hotel, stream_results
+from api_requests.queries import search_query, property_list_query
 from api_requests.request_api import request_search, request_property_list, request_get_photo, request_bestdeal
 from keyboards import keyboards, keyboards_text, calendar
-from telebot.types import CallbackQuery, InputMediaPhoto, Message
+from telebot.types import CallbackQuery, Message
+from .media import send_hotel_photos
+from .rendering import render_hotel
 from .start_help import start_command, check_state_inline_keyboard
 
 
@@ -29,6 +33,7 @@ def record_command(message: Union[Message, CallbackQuery]) -> None:
     :return: None
     """
     logger.info(str(message.from_user.id))
+    user = user_storage.get_user(message.from_user.id)
     check_state_inline_keyboard(message)
     if isinstance(message, CallbackQuery):
         user.edit('command', message.data[1:])
@@ -58,7 +63,8 @@ def choice_city(message: Union[Message, CallbackQuery]) -> None:
 @exception_handler
 def search_city(message: Message) -> None:
     """
-    Функция - обрабатывает введённый пользователем город. Делает запрос на rapidapi.com.
+    Функция - обрабатывает введённый пользователем город. Сначала ищет список городов в кэше,
+    при его отсутствии делает запрос на rapidapi.com и сохраняет результат в кэш.
     В случае ошибки запроса, сообщает о неполадках и возвращает пользователя на ввод города.
     В случае положительного ответа, обрабатывает его и в виде inline-кнопок отправляет
     пользователю все похожие варианты ответа.
@@ -67,29 +73,29 @@ def search_city(message: Message) -> None:
     :return: None
     """
     logger.info(str(message.from_user.id))
+    user = user_storage.get_user(message.from_user.id)
     if message.text in constants.COMMAND_LIST:
         start_command(message)
     else:
-        response = request_search(message)
-        if check_status_code(response):
-            pattern_city_group = r'(?<="CITY_GROUP",).+?[\]]'
-            find_cities = re.findall(pattern_city_group, response.text)
-            if len(find_cities[0]) > 20:
-                pattern_dest = r'(?<="destinationId":")\d+'
-                destination = re.findall(pattern_dest, find_cities[0])
-                pattern_city = r'(?<="name":")\w+[\s, \w]\w+'
-                city = re.findall(pattern_city, find_cities[0])
-                city_list = list(zip(destination, city))
-                bot_message = bot.send_message(
-                    message.from_user.id, constants.CORRECTION, reply_markup=keyboards.keyboards_city(city_list)
-                )
-                user.edit('bot_message', bot_message)
-            else:
-                bot.send_message(message.from_user.id, constants.INCORRECT_CITY)
-                choice_city(message)
-        else:
+        query = search_query(message.text, user.user.currency)
+        user.edit('locale', query.locale)
+        city_list = city_cache.get(query.cache_key)
+        if city_list is None:
+            response = request_search(message, query)
+            if check_status_code(response):
+                city_list = parse_city_list(response.content)
+                city_cache.set(query.cache_key, city_list)
+        if city_list is None:
             bot.send_message(message.from_user.id, constants.REQUEST_ERROR)
             choice_city(message)
+        elif city_list:
+            bot_message = bot.send_message(
+                message.from_user.id, constants.CORRECTION, reply_markup=keyboards.keyboards_city(city_list)
+            )
+            user.edit('bot_message', bot_message)
+        else:
+            bot.send_message(message.from_user.id, constants.INCORRECT_CITY)
+            choice_city(message)
 
 
 @bot.callback_query_handler(func=lambda call: call.data.isdigit())
@@ -103,6 +109,7 @@ def callback_city(call: CallbackQuery) -> None:
     :return: None
     """
     logger.info(str(call.from_user.id))
+    user = user_storage.get_user(call.from_user.id)
     for city in call.message.json['reply_markup']['inline_keyboard']:
         if city[0]['callback_data'] == call.data:
             user.edit('city', city[0]['text'])
@@ -132,6 +139,7 @@ def callback_currency(call: CallbackQuery) -> None:
     :return: None
     """
     logger.info(str(call.from_user.id))
+    user = user_storage.get_user(call.from_user.id)
     bot.edit_message_reply_markup(call.message.chat.id, call.message.message_id)
     bot.edit_message_text(
         chat_id=call.message.chat.id, message_id=call.message.message_id,
@@ -155,6 +163,7 @@ def count_hotel(call: CallbackQuery) -> None:
     :return: None
     """
     logger.info(str(call.from_user.id))
+    user = user_storage.get_user(call.from_user.id)
     bot_message = bot.send_message(
         call.from_user.id, constants.COUNT_HOTEL, reply_markup=keyboards.keyboards_count_photo()
     )
@@ -169,6 +178,7 @@ def choice_photo(call: CallbackQuery):
     :return: None
     """
     logger.info(str(call.from_user.id))
+    user = user_storage.get_user(call.from_user.id)
     bot_message = bot.send_message(
         call.from_user.id, constants.QUESTION_PHOTO, reply_markup=keyboards.keyboards_photo()
     )
@@ -188,6 +198,7 @@ def callback_photo(call: CallbackQuery) -> None:
     :return: None
     """
     logger.info(str(call.from_user.id))
+    user = user_storage.get_user(call.from_user.id)
     bot.edit_message_reply_markup(call.message.chat.id, call.message.message_id)
     user.edit('photo', call.data)
     if call.data == 'Да':
@@ -221,6 +232,7 @@ def callback_count_photo(call: CallbackQuery) -> None:
     :return: None
     """
     logger.info(str(call.from_user.id))
+    user = user_storage.get_user(call.from_user.id)
     bot.edit_message_reply_markup(call.message.chat.id, call.message.message_id)
     for elem in call.message.json['reply_markup']['inline_keyboard']:
         for num in elem:
@@ -245,42 +257,83 @@ def callback_count_photo(call: CallbackQuery) -> None:
 def load_result(call: CallbackQuery) -> None:
     """
     Функция - записывающая последний аргумент в экземпляр класса UserHandle.
-    Оповещает пользователя о выполнении загрузки. Проверяет, если пользователь выбирал команду 'bestdeal',
-    то делает запрос к API (request_bestdeal), в противном случае делает запрос к API (request_property_list).
-    Далее с ответом из API осуществляется переход в функцию 'request_hotels'.
+    Оповещает пользователя о выполнении загрузки. Получает список отелей в функции 'fetch_hotels'
+    (из кэша, или запросом к API), а для команды 'bestdeal' - в функции 'bestdeal_hotels' файла 'bestdeal'
+    (несколько страниц выдачи одновременно) и осуществляет переход в функцию 'request_hotels'.
 
     :param call: CallbackQuery
     :return: None
     """
     logger.info(str(call.from_user.id))
+    user = user_storage.get_user(call.from_user.id)
     user.edit('date', datetime.strftime(datetime.now(), '%Y-%m-%d %H:%M:%S'))
     bot.send_message(call.from_user.id, constants.LOAD_RESULT)
     if user.user.command == constants.BESTDEAL[1:]:
-        response_hotels = request_bestdeal(call)
+        result_hotels = bestdeal.bestdeal_hotels(call)
+    else:
+        result_hotels = fetch_hotels(call, needed=user.user.count_hotel)
+    request_hotels(call, result_hotels)
+
+
+def fetch_hotels(call: CallbackQuery, page_number: int = 1, needed: Optional[int] = None) -> Optional[Iterable[Hotel]]:
+    """
+    Функция - возвращающая отели (Hotel, без id команды) по параметрам поиска пользователя. Сначала ищет
+    результат в кэше по полному набору параметров запроса: запись подходит, если страница прочитана
+    полностью, или в ней не меньше needed отелей. Иначе, если пользователь выбирал команду 'bestdeal',
+    то делает запрос к API (request_bestdeal), в противном случае делает запрос к API (request_property_list).
+    Ответ API не разбирается целиком: отели разбираются (функция 'parse_hotel') и возвращаются генератором
+    по одному по мере чтения ответа, а в кэш сохраняются их компактные записи (Hotel.get_record) -
+    вся страница, или прочитанная часть, если потребитель остановился раньше. В случае ошибки запроса
+    (в том числе, если запрос не выполнен и пользователь уже оповещён декоратором) возвращает None.
+
+    :param call: CallbackQuery
+    :param page_number: int
+    :param needed: Optional[int]
+    :return: Optional[Iterable[Hotel]]
+    """
+    logger.info(str(call.from_user.id))
+    user = user_storage.get_user(call.from_user.id)
+    query = property_list_query(user.user, page_number)
+    cached = property_cache.get(query.cache_key)
+    if cached is not None and (cached['complete'] or needed is not None and len(cached['items']) >= needed):
+        return [Hotel.from_record(record, call.from_user.id, 0) for record in cached['items']]
+    if query.is_bestdeal:
+        response_hotels = request_bestdeal(call, page_number)
     else:
         response_hotels = request_property_list(call)
-    request_hotels(call, response_hotels)
+    if response_hotels is None:
+        return None
+    if not check_status_code(response_hotels):
+        response_hotels.close()
+        return None
+    user_hotels = (
+        parse_hotel(hotel, user.user.currency, user.user.locale, call.from_user.id, 0)
+        for hotel in stream_results(response_hotels)
+    )
+    records = property_cache.collect(
+        query.cache_key, (user_hotel.get_record() for user_hotel in user_hotels if user_hotel is not None)
+    )
+    return (Hotel.from_record(record, call.from_user.id, 0) for record in records)
 
 
 @exception_handler
-def request_hotels(call: CallbackQuery, response_hotels: Response) -> None:
+def request_hotels(call: CallbackQuery, result_hotels: Union[Iterable[Hotel], bool, None]) -> None:
     """
-    Функция - обрабатывающая ответ с API. Если статус код успешный, то создаётся запись в БД,
-    о команде пользователя. Ответ с API десериализуется и проверяется в экземпляре пользователя введённая команда.
-    Если команда 'bestdeal результат поиска дополнительно обрабатывается в функции 'bestdeal_logic' файла 'bestdeal'.
-    И затем осуществляется переход в функцию showing_hotels. Если статус код ответа не успешный,
+    Функция - обрабатывающая список отелей. Если список получен, то создаётся запись в БД,
+    о команде пользователя и проверяется в экземпляре пользователя введённая команда.
+    Если команда 'bestdeal' и подходящие отели не набрались (False), то пользователю выдаётся сообщение,
+    что отели не найдены. Иначе осуществляется переход в функцию showing_hotels. Если запрос к API завершился ошибкой,
     то пользователю выдаётся сообщение об ошибке поиска.
 
     :param call: CallbackQuery
-    :param response_hotels: Response
+    :param result_hotels: Union[Iterable[Hotel], bool, None]
     :return: None
     """
     logger.info(str(call.from_user.id))
-    if check_status_code(response_hotels):
-        DataBaseModel.insert_user(user.get_tuple())
-        result_hotels = json.loads(response_hotels.text)['data']['body']['searchResults']['results']
+    user = user_storage.get_user(call.from_user.id)
+    if result_hotels is not None:
+        user.edit('command_id', DataBaseModel.insert_user(user.get_tuple()))
         if user.user.command == constants.BESTDEAL[1:]:
-            result_hotels = bestdeal.bestdeal_logic(call, result_hotels, result=[])
             if result_hotels is False:
                 bot.send_message(call.from_user.id, constants.NOT_FOUND)
                 bot_message = bot.send_message(
@@ -300,150 +353,119 @@ def request_hotels(call: CallbackQuery, response_hotels: Response) -> None:
 
 
 @exception_handler
-def showing_hotels(call: CallbackQuery, result_hotels: Any) -> None:
+def showing_hotels(call: CallbackQuery, result_hotels: Iterable[Hotel]) -> None:
     """
-    Функция - выводит пользователю информацию по отелям. Подставляя данные по отелям в шаблон,
-    в функции 'hotel_template'. Вывод осуществляется при условии, что пользователь отказался от вывода фото,
-    в противном случае осуществляем переход в функцию 'showing_hotels_with_photo'.
-    Так же, если вывод осущствлен, происходит запись данных об отеле в БД.
+    Функция - выводит пользователю информацию по отелям. Отбирает необходимое пользователю количество
+    уже разобранных отелей (остаток ответа API не читается) и проставляет им id команды,
+    текст сообщения о каждом из них собирается из шаблона
+    в функции 'render_hotel'. Вывод осуществляется при условии, что пользователь отказался от вывода фото,
+    в противном случае осуществляем переход в функцию 'showing_hotels_with_photo'. Так же, после вывода,
+    происходит запись данных об отелях в БД одной транзакцией. Вывод отелей идёт в очереди отправки
+    как массовый (bot.bulk()) и уступает ответам на действия других пользователей.
 
     :param call: CallbackQuery
-    :param result_hotels: Any
+    :param result_hotels: Iterable[Hotel]
     :return: None
     """
     logger.info(str(call.from_user.id))
-    index = 0
-    for hotel in result_hotels:
-        if index == user.user.count_hotel:
-            bot.send_message(call.from_user.id, constants.SEARCH_RESULT)
-            bot_message = bot.send_message(
-                call.from_user.id, constants.INSTRUCTION, reply_markup=keyboard_commands(call.data)
-            )
-            user.set_default()
-            user.edit('bot_message', bot_message)
-            break
+    user = user_storage.get_user(call.from_user.id)
+    result_hotels = iter(result_hotels)
+    selected_hotels = list(islice(result_hotels, user.user.count_hotel))
+    if hasattr(result_hotels, 'close'):
+        result_hotels.close()
+    for user_hotel in selected_hotels:
+        user_hotel.command_id = user.user.command_id
+    with bot.bulk():
+        if user.user.count_photo != 0:
+            showing_hotels_with_photo(call, selected_hotels)
         else:
-            hotel_show = hotel_template(
-                call=call, currency=user.user.currency, days=user.user.day_period, hotel=hotel
-            )
-            if hotel_show is not None:
-                index += 1
-                user_hotel = Hotel(call.from_user.id, hotel_show)
-                if user.user.count_photo != 0:
-                    showing_hotels_with_photo(call, hotel, hotel_show, user_hotel)
-                else:
-                    DataBaseModel.insert_hotel(user_hotel)
-                    bot.send_message(call.from_user.id, hotel_show, parse_mode='Markdown')
-
-
-def hotel_template(call: CallbackQuery, currency: str, days: int, hotel: Dict) -> Optional[str]:
-    """
-    Функция - подставляющая параметры отеля в шаблон. Для выбора русскоязычного шаблона,
-    или англоязычного, делается запрос в функцию 'locale_choice', которая и возаращает нужный шаблон.
-
-    :param call: CallbackQuery
-    :param currency: str
-    :param days: int
-    :param hotel: Dict
-    :return: Optional[str]
-    """
-    logger.info(str(call.from_user.id))
-    try:
-        hotel_show = locale_choice(call)
-        link = settings.URL_HOTEL.format(hotel['id'])
-        if currency == 'USD':
-            price = int(hotel['ratePlan']['price']['current'][1:])
-            cur_sym = '$'
-            price_per_period = price * days
-        elif currency == 'EUR':
-            price = int(hotel['ratePlan']['price']['current'][:-2])
-            cur_sym = '€'
-            price_per_period = price * days
-        else:
-            price = hotel['ratePlan']['price']['current'][:-4]
-            price_ru = re.sub(r'[,]', '', price)
-            price_per_period = int(price_ru) * days
-            cur_sym = 'RUB'
-        name = hotel['name']
-        address = hotel['address']['streetAddress']
-        distance = hotel['landmarks'][0]['distance']
-        star_rating = hotel['starRating']
-        return hotel_show.format(
-            name, address, distance, price,
-            cur_sym, price_per_period,
-            cur_sym, star_rating, link
-        )
-    except KeyError:
-        return None
+            for user_hotel in selected_hotels:
+                bot.send_message(
+                    call.from_user.id, render_hotel(user_hotel, user.user.day_period, user.user.locale),
+                    parse_mode='Markdown'
+                )
+            DataBaseModel.insert_hotels(selected_hotels)
+    bot.send_message(call.from_user.id, constants.SEARCH_RESULT)
+    bot_message = bot.send_message(
+        call.from_user.id, constants.INSTRUCTION, reply_markup=keyboard_commands(call.data)
+    )
+    user.set_default()
+    user.edit('bot_message', bot_message)
 
 
-def locale_choice(call: CallbackQuery) -> str:
+@exception_handler
+def showing_hotels_with_photo(call: CallbackQuery, selected_hotels: List[Hotel]) -> None:
     """
-    Функция - возвращающая необходимый шаблон в функцию 'hotel_template'.
-    Проверка осуществляется по совпадению атрибута locale у экземпляра класса пользователя.
+    Функция - вызываемая в случае, если пользователь указал наличие фотографий к отелям. Запросы фотографий
+    ко всем отобранным отелям выполняются одновременно в пуле потоков (функция 'hotel_media').
+    Показ информации об отеле осуществляется медиа-группой (функция 'send_hotel_photos'), как только готов
+    очередной отель (порядок отелей сохраняется). Так же в функции происходит сохранение инфо по отелям в БД
+    (одной транзакцией, после вывода всех отелей).
 
     :param call: CallbackQuery
-    :return: str
+    :param selected_hotels: List[Hotel]
+    :return: None
     """
     logger.info(str(call.from_user.id))
-    if user.user.locale == 'en_US':
-        hotel_show = constants.HOTEL_SHOW_EN
-    else:
-        hotel_show = constants.HOTEL_SHOW_RU
-    return hotel_show
+    user = user_storage.get_user(call.from_user.id)
+    hotel_shows = [render_hotel(user_hotel, user.user.day_period, user.user.locale) for user_hotel in selected_hotels]
+    futures = [
+        client.request_executor.submit(hotel_media, call, user_hotel) for user_hotel in selected_hotels
+    ]
+    user_hotels = []
+    for user_hotel, hotel_show, future in zip(selected_hotels, hotel_shows, futures):
+        result = future.result()
+        if result is not None:
+            user_hotel.photos = result
+            if user_hotel.photos:
+                send_hotel_photos(call.from_user.id, user_hotel.photos, hotel_show)
+            else:
+                bot.send_message(call.from_user.id, hotel_show, parse_mode='Markdown')
+            user_hotels.append(user_hotel)
+    DataBaseModel.insert_hotels(user_hotels)
 
 
 @exception_handler
-def showing_hotels_with_photo(call: CallbackQuery, hotel: Dict, hotel_show: str, user_hotel: Hotel) -> None:
+def hotel_media(call: CallbackQuery, user_hotel: Hotel) -> Optional[List[str]]:
     """
-    Функция - вызываемая в случае, если пользователь указал наличие фотографий к отелям. Делается запрос к API.
-    Если ответ с успешным статус-кодом, то дополнительно вызывается функция 'photo_append', из которой получаем список
-    медиа-инпутов. Показ информации об отеле осуществляется медиа-группой. Так же в функции происходит
-    сохранение инфо по отелю в БД.
+    Функция - делающая запрос к API за фотографиями отеля. Если ответ с успешным статус-кодом, то дополнительно
+    вызывается функция 'photo_append', из которой получаем список url доступных фотографий.
 
     :param call: CallbackQuery
-    :param hotel: Dict
-    :param hotel_show: str
     :param user_hotel: Hotel
-    :return: None
+    :return: Optional[List[str]]
     """
     logger.info(str(call.from_user.id))
-    response_photo = request_get_photo(call, hotel['id'])
+    response_photo = request_get_photo(call, user_hotel.hotel_id)
     if check_status_code(response_photo):
         result_photo = json.loads(response_photo.text)['hotelImages']
-        media_massive, photo_str = photo_append(call, result_photo, hotel_show)
-        bot.send_media_group(call.from_user.id, media=media_massive)
-        user_hotel.photo = photo_str
-        DataBaseModel.insert_hotel(user_hotel)
+        return photo_append(call, result_photo)
 
 
 @exception_handler
-def photo_append(call: CallbackQuery, result_photo: List, hotel_show: str) -> Tuple[List, str]:
+def photo_append(call: CallbackQuery, result_photo: List) -> List[str]:
     """
-    Функция подготавливающая список с медиа-инпутами для медиа-группы.
-    Так же проверяет запросы к фотографиям на наличие ошибки.
+    Функция подготавливающая список url фотографий для медиа-группы.
+    Так же проверяет доступность фотографий лёгкими HEAD-запросами, которые выполняются параллельно
+    (результат проверки каждого url кэшируется).
+    Если часть фотографий недоступна, проверяется следующая порция, пока не наберётся нужное количество.
 
     :param call: CallbackQuery
     :param result_photo: List
-    :param hotel_show: str
-    :return: tuple[List, str]
+    :return: List[str]
     """
     logger.info(str(call.from_user.id))
-    index = 0
-    photo_str = ''
-    media_massive = []
-    for photo_dict in result_photo:
-        if index == user.user.count_photo:
-            return media_massive, photo_str
-        else:
-            photo_str += photo_dict['baseUrl'].format(size='y') + ' '
-            photo = photo_dict['baseUrl'].format(size='y')
-            response = requests.get(photo)
-            if check_status_code(response):
-                index += 1
-                media_massive.append(
-                    InputMediaPhoto(photo, caption=hotel_show if index == 1 else '', parse_mode='Markdown')
-                )
+    user = user_storage.get_user(call.from_user.id)
+    candidates = [photo_dict['baseUrl'].format(size='y') for photo_dict in result_photo]
+    valid_photos = []
+    position = 0
+    while len(valid_photos) < user.user.count_photo and position < len(candidates):
+        batch = candidates[position: position + user.user.count_photo - len(valid_photos)]
+        position += len(batch)
+        for photo, is_valid in zip(batch, client.check_urls(batch)):
+            if is_valid:
+                valid_photos.append(photo)
+    return valid_photos
 
 
 def check_status_code(response: Response) -> Optional[bool]:
@@ -0,0 +1,88 @@
+"""
+Файл с отправкой фотографий отелей медиа-группой. Для каждого url фотографии сохраняется идентификатор файла,
+который Telegram возвращает после первой отправки, и при повторных показах (новый поиск, или история)
+фотография отправляется по file_id, без повторного скачивания Telegram-ом с CDN.
+"""
+
+from typing import Dict, List
+from telebot.apihelper import ApiTelegramException
+from telebot.types import InputMediaPhoto, Message
+from database.models import DataBaseModel
+from loader import bot, logger
+
+INVALID_FILE_ID_ERRORS = ('wrong file identifier', 'wrong remote file identifier', 'file reference')
+
+
+def media_group(photos: List[str], caption: str, file_ids: Dict[str, str]) -> List[InputMediaPhoto]:
+    """
+    Функция - подготавливающая список медиа-инпутов. Если для url известен file_id, то используется он.
+    Подпись ставится только у первой фотографии.
+
+    :param photos: List[str]
+    :param caption: str
+    :param file_ids: Dict[str, str]
+    :return: List[InputMediaPhoto]
+    """
+    return [
+        InputMediaPhoto(file_ids.get(photo, photo), caption=caption if index == 0 else '', parse_mode='Markdown')
+        for index, photo in enumerate(photos)
+    ]
+
+
+def message_file_ids(photos: List[str], messages: List[Message]) -> Dict[str, str]:
+    """
+    Функция - возвращающая file_id самого большого размера каждой отправленной фотографии по её url
+
+    :param photos: List[str]
+    :param messages: List[Message]
+    :return: Dict[str, str]
+    """
+    file_ids = {}
+    for photo, message in zip(photos, messages):
+        if message.photo:
+            file_ids[photo] = max(message.photo, key=lambda size: size.width * size.height).file_id
+    return file_ids
+
+
+def invalid_file_id(error: ApiTelegramException) -> bool:
+    """
+    Функция - проверяющая, что Telegram отклонил запрос из-за идентификатора файла (ответ 400).
+    Остальные ошибки (429, 5xx и т.п.) не говорят о том, что сохранённые file_id устарели. Telegram
+    отвечает тем же текстом ('wrong file identifier/HTTP URL specified') и на недоступный url,
+    поэтому ответ говорит только о том, что не принят один из элементов медиа-группы.
+
+    :param error: ApiTelegramException
+    :return: bool
+    """
+    description = (error.description or '').lower()
+    return error.error_code == 400 and any(text in description for text in INVALID_FILE_ID_ERRORS)
+
+
+def send_hotel_photos(chat_id: int, photos: List[str], caption: str) -> List[Message]:
+    """
+    Функция - отправляющая фотографии отеля медиа-группой. Фотографии, отправленные ранее, передаются по file_id,
+    а file_id новых фотографий сохраняются в БД. Если Telegram не принял идентификатор файла, то медиа-группа
+    отправляется повторно только по url, и лишь если это удалось (значит, не приняты именно сохранённые file_id),
+    они удаляются из БД. Если не удалась и отправка по url (недоступна фотография), или ошибка другая,
+    то исключение выбрасывается дальше, а сохранённые file_id не трогаются.
+
+    :param chat_id: int
+    :param photos: List[str]
+    :param caption: str
+    :return: List[Message]
+    """
+    file_ids = DataBaseModel.select_file_ids(photos)
+    try:
+        messages = bot.send_media_group(chat_id, media=media_group(photos, caption, file_ids))
+    except ApiTelegramException as error:
+        if not file_ids or not invalid_file_id(error):
+            raise
+        messages = bot.send_media_group(chat_id, media=media_group(photos, caption, {}))
+        logger.error('Сохранённые file_id фотографий не приняты', exc_info=error)
+        DataBaseModel.delete_file_ids(list(file_ids))
+        file_ids = {}
+    new_file_ids = {
+        photo: file_id for photo, file_id in message_file_ids(photos, messages).items() if photo not in file_ids
+    }
+    DataBaseModel.insert_file_ids(new_file_ids)
+    return messages
@@ -0,0 +1,86 @@
+"""
+Файл с отбором и ранжированием отелей для команды bestdeal. Отели каждой страницы выдачи (Hotel)
+раскладываются в компактные столбцы (расстояние до центра в километрах, цена, звёзды), по которым
+отели фильтруются по диапазонам пользователя и ранжируются по общей оценке цены и удалённости (чем меньше, тем лучше).
+"""
+
+import heapq
+import math
+
+from array import array
+from dataclasses import dataclass, field
+from itertools import compress
+from typing import Iterable, List
+from database.models import Hotel
+from settings.settings import BESTDEAL_PRICE_WEIGHT, BESTDEAL_DISTANCE_WEIGHT, BESTDEAL_STARS_WEIGHT
+
+
+@dataclass
+class HotelColumns:
+    """
+    Dataclass - для хранения отелей со страниц выдачи в виде столбцов. Расстояние, которое
+    не удалось разобрать, хранится как nan, и такой отель не проходит фильтр.
+    """
+    hotels: List[Hotel] = field(default_factory=list)
+    distance_km: array = field(default_factory=lambda: array('d'))
+    price: array = field(default_factory=lambda: array('d'))
+    stars: array = field(default_factory=lambda: array('d'))
+
+    def extend(self, result_hotels: Iterable[Hotel]) -> None:
+        """
+        Метод класса HotelColumns, добавляющий отели страницы выдачи в столбцы
+
+        :param result_hotels: Iterable[Hotel]
+        :return: None
+        """
+        for hotel in result_hotels:
+            self.hotels.append(hotel)
+            self.distance_km.append(math.nan if hotel.distance_km is None else hotel.distance_km)
+            self.price.append(hotel.price)
+            self.stars.append(float(hotel.stars or 0))
+
+    def mask(self, min_distance: float, max_distance: float, price_min: float, price_max: float,
+             start: int = 0) -> List[bool]:
+        """
+        Метод класса HotelColumns, возвращающий маску отелей (начиная с индекса start),
+        попадающих в диапазоны расстояния и цены
+
+        :param min_distance: float
+        :param max_distance: float
+        :param price_min: float
+        :param price_max: float
+        :param start: int
+        :return: List[bool]
+        """
+        return [
+            min_distance <= distance <= max_distance and price_min <= price <= price_max
+            for distance, price in zip(self.distance_km[start:], self.price[start:])
+        ]
+
+
+def rank_hotels(columns: HotelColumns, min_distance: float, max_distance: float,
+                price_min: float, price_max: float, top_k: int) -> List[Hotel]:
+    """
+    Функция - отбирающая отели, попадающие в диапазоны пользователя, и возвращающая top_k лучших из них.
+    Оценка отеля - взвешенная сумма нормированных по диапазонам пользователя цены и расстояния
+    за вычетом нормированного количества звёзд.
+
+    :param columns: HotelColumns
+    :param min_distance: float
+    :param max_distance: float
+    :param price_min: float
+    :param price_max: float
+    :param top_k: int
+    :return: List[Hotel]
+    """
+    hotel_mask = columns.mask(min_distance, max_distance, price_min, price_max)
+    selected = list(compress(range(len(columns.hotels)), hotel_mask))
+    distance_span = (max_distance - min_distance) or 1
+    price_span = (price_max - price_min) or 1
+    scores = {
+        index: BESTDEAL_PRICE_WEIGHT * (columns.price[index] - price_min) / price_span
+        + BESTDEAL_DISTANCE_WEIGHT * (columns.distance_km[index] - min_distance) / distance_span
+        - BESTDEAL_STARS_WEIGHT * columns.stars[index] / 5
+        for index in selected
+    }
+    return [columns.hotels[index] for index in heapq.nsmallest(top_k, selected, key=scores.__getitem__)]
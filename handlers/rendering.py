@@ -0,0 +1,71 @@
+"""
+Файл с выводом сохранённых отелей в текст сообщения. Шаблон выбирается по локали один раз и кэшируется,
+поэтому и новые результаты поиска, и история собираются из одних и тех же типизированных полей.
+"""
+
+import string
+
+from datetime import datetime
+from functools import lru_cache
+from typing import Callable
+from database.models import Hotel
+from settings import constants
+from settings.settings import URL_HOTEL
+
+
+@lru_cache(maxsize=None)
+def hotel_template(locale: str) -> Callable[..., str]:
+    """
+    Функция - возвращающая (с кэшированием) метод форматирования шаблона отеля для локали
+
+    :param locale: str
+    :return: Callable[..., str]
+    """
+    if locale == 'en_US':
+        return constants.HOTEL_SHOW_EN.format
+    return constants.HOTEL_SHOW_RU.format
+
+
+def render_hotel(hotel: Hotel, days: int, locale: str) -> str:
+    """
+    Функция - подставляющая параметры отеля в шаблон (русскоязычный, или англоязычный)
+
+    :param hotel: Hotel
+    :param days: int
+    :param locale: str
+    :return: str
+    """
+    cur_sym = constants.CURRENCY_SYMBOLS.get(hotel.currency, hotel.currency)
+    if hotel.distance_km is None:
+        distance = '-'
+    else:
+        distance = '{:.1f} {}'.format(hotel.distance_km, constants.DISTANCE_UNITS.get(locale, 'км'))
+    return hotel_template(locale)(
+        hotel.name, hotel.address, distance, '{:,}'.format(hotel.price),
+        cur_sym, hotel.price * days,
+        cur_sym, '-' if hotel.stars is None else hotel.stars, URL_HOTEL.format(hotel.hotel_id)
+    )
+
+
+def history_locale(city: str) -> str:
+    """
+    Функция - определяющая локаль сохранённого поиска по названию города (как и шаблон команды в истории)
+
+    :param city: str
+    :return: str
+    """
+    for sym in city:
+        if sym not in string.printable:
+            return 'ru_RU'
+    return 'en_US'
+
+
+def period_days(date_in: str, date_out: str) -> int:
+    """
+    Функция - возвращающая количество суток проживания по датам заезда и выезда
+
+    :param date_in: str
+    :param date_out: str
+    :return: int
+    """
+    return (datetime.strptime(date_out, '%Y-%m-%d') - datetime.strptime(date_in, '%Y-%m-%d')).days
@@ -1,6 +1,6 @@
 from telebot.apihelper import ApiTelegramException
 from telebot.types import Message, CallbackQuery
-from database.models import user
+from database.models import user_storage
 from loader import bot, logger
 from handlers import lowprice_highprice, history
 from settings import constants
@@ -19,6 +19,7 @@ def start_command(message: Message) -> None:
     :return: None
     """
     logger.info(str(message.from_user.id))
+    user = user_storage.get_user(message.from_user.id)
     check_state_inline_keyboard(user.user.bot_message)
     user.set_default()
     user.edit('user_id', message.from_user.id)
@@ -46,6 +47,7 @@ def suggest_finding_a_hotel(message: Message) -> None:
     :param message: Message
     :return: None
     """
+    user = user_storage.get_user(message.from_user.id)
     bot.send_message(message.from_user.id, constants.SUGGEST_FINDING)
     bot_message = bot.send_message(
         message.from_user.id, constants.HELP_MESSAGE, reply_markup=keyboard_commands(message.text)
@@ -65,6 +67,7 @@ def callback_command(call: CallbackQuery) -> None:
     :return: None
     """
     logger.info(str(call.from_user.id))
+    user = user_storage.get_user(call.from_user.id)
     user.set_default()
     user.edit('user_id', call.from_user.id)
     if call.data == constants.HELP:
@@ -89,6 +92,7 @@ def echo_handler(message: Message) -> None:
     :return: None
     """
     logger.info(str(message.from_user.id))
+    user = user_storage.get_user(message.from_user.id)
     message_text = message.text.lower()
     if message_text.startswith(constants.WELCOME_LIST[0]) or message_text.startswith(constants.WELCOME_LIST[1]):
         bot.send_message(message.from_user.id, constants.WELCOME.format(message.from_user.first_name))
@@ -1,5 +1,5 @@
 from telebot.types import CallbackQuery
-from database.models import user
+from database.models import user_storage
 from loader import bot, logger, exception_handler
 from telegram_bot_calendar import DetailedTelegramCalendar
 from keyboards.keyboards_text import LSTEP
@@ -27,6 +27,7 @@ def date_in(call: CallbackQuery) -> None:
     :return: None
     """
     logger.info(str(call.from_user.id))
+    user = user_storage.get_user(call.from_user.id)
     calendar, step = CustomCalendar(
         calendar_id=0,
         locale='ru',
@@ -49,6 +50,7 @@ def callback_first_calendar(call: CallbackQuery) -> None:
     :return: None
     """
     logger.info(str(call.from_user.id))
+    user = user_storage.get_user(call.from_user.id)
     result, key, step = CustomCalendar(
         calendar_id=0,
         locale='ru',
@@ -77,6 +79,7 @@ def date_out(call: CallbackQuery, result: datetime) -> None:
     :return: None
     """
     logger.info(str(call.from_user.id))
+    user = user_storage.get_user(call.from_user.id)
     min_date = result + timedelta(days=1)
     second_calendar, second_step = CustomCalendar(
         calendar_id=15,
@@ -103,6 +106,7 @@ def callback_second_calendar(call: CallbackQuery) -> None:
     :return: None
     """
     logger.info(str(call.from_user.id))
+    user = user_storage.get_user(call.from_user.id)
     min_date = user.user.date_in + timedelta(days=1)
     result, key, step = CustomCalendar(
         calendar_id=15,
@@ -42,13 +42,15 @@ def keyboards_currency() -> InlineKeyboardMarkup:
 
 def keyboards_city(city_list: List[tuple]) -> InlineKeyboardMarkup:
     """
-    Функция - создаёт inline-клавиатуру с уточнением города поиска.
+    Функция - создаёт inline-клавиатуру с уточнением города поиска. Текст кнопки - подпись города
+    (город, регион, страна), чтобы различались одноимённые города. Если подписи нет (запись кэша
+    в старом формате), то выводится название города.
 
     :return: InlineKeyboardMarkup
     """
     keyboard = types.InlineKeyboardMarkup(row_width=1)
     for city in city_list:
-        key = types.InlineKeyboardButton(text=city[1], callback_data=city[0])
+        key = types.InlineKeyboardButton(text=city[2] if len(city) > 2 else city[1], callback_data=city[0])
         keyboard.add(key)
     return keyboard
 
@@ -98,3 +100,21 @@ def keyboard_history(message: str) -> InlineKeyboardMarkup:
         key = types.InlineKeyboardButton(text=elem, callback_data=elem)
         keyboard.add(key)
     return keyboard
+
+
+def keyboard_history_page(before_id: int, page_size: int) -> InlineKeyboardMarkup:
+    """
+    Функция - создаёт inline-клавиатуру для перехода к следующей странице истории.
+    В callback_data передаётся id последней показанной команды.
+
+    :param before_id: int
+    :param page_size: int
+    :return: InlineKeyboardMarkup
+    """
+    keyboard = types.InlineKeyboardMarkup()
+    key = types.InlineKeyboardButton(
+        text=keyboards_text.KEY_HISTORY_PAGE.format(page_size),
+        callback_data=keyboards_text.HISTORY_PAGE + str(before_id)
+    )
+    keyboard.add(key)
+    return keyboard
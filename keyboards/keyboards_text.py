@@ -15,3 +15,5 @@ CALLBACK_PHOTO = ['one', 'two', 'three', 'four', 'five', 'six', 'seven', 'eight'
 LSTEP = {'y': 'год', 'm': 'месяц', 'd': 'день'}
 HISTORY_LIST = ['Просмотреть', 'Очистить']
 HISTORY_SHOW_LIST = ['Полная история', 'Последние действия']
+KEY_HISTORY_PAGE = 'Следующие {} поисков'
+HISTORY_PAGE = 'history_page:'
@@ -2,17 +2,36 @@
 Файл для создания экземпляров: бота и логгера.
 Так же содержит декоратор для отлова исключений и логгирования ошибок
 """
-from typing import Callable
+import functools
+import metrics
 
-from requests import ReadTimeout
-from telebot import TeleBot
-from database.models import user
+from typing import Callable, Optional
+
+from requests import RequestException
+from telebot import apihelper
+from telebot.types import Message, CallbackQuery
 from logging_config import custom_logger
+from send_queue import QueuedTeleBot
 from settings import constants
-from settings.settings import TOKEN
+from settings.settings import TOKEN, BOT_NUM_THREADS, BOT_RUNTIME, TELEGRAM_API_URL
 
 logger = custom_logger('bot_logger')
-bot = TeleBot(token=TOKEN)
+if TELEGRAM_API_URL:
+    apihelper.API_URL = TELEGRAM_API_URL + '/bot{0}/{1}'
+apihelper.CUSTOM_REQUEST_SENDER = metrics.telegram_request
+bot = QueuedTeleBot(token=TOKEN, num_threads=BOT_NUM_THREADS, threaded=BOT_RUNTIME == 'threaded')
+
+
+def get_user_id(args: tuple) -> Optional[int]:
+    """
+    Функция - возвращающая id пользователя из аргументов обработчика (Message, или CallbackQuery).
+
+    :param args: tuple
+    :return: Optional[int]
+    """
+    for arg in args:
+        if isinstance(arg, (Message, CallbackQuery)):
+            return arg.from_user.id
 
 
 def exception_handler(func: Callable) -> Callable:
@@ -22,13 +41,17 @@ def exception_handler(func: Callable) -> Callable:
     :param func: Callable
     :return: Callable
     """
+    @functools.wraps(func)
     def wrapped_func(*args, **kwargs):
         try:
             result = func(*args, **kwargs)
             return result
         except Exception as error:
             logger.error('В работе бота возникло исключение', exc_info=error)
-            bot.send_message(user.user.user_id, constants.REQUEST_ERROR)
+            metrics.count_error('handler', func.__name__)
+            user_id = get_user_id(args)
+            if user_id is not None:
+                bot.send_message(user_id, constants.REQUEST_ERROR)
     return wrapped_func
 
 
@@ -39,11 +62,14 @@ def exception_request_handler(func: Callable) -> Callable:
     :param func: Callable
     :return: Callable
     """
+    @functools.wraps(func)
     def wrapped_func(*args, **kwargs):
         try:
             result = func(*args, **kwargs)
             return result
-        except (ConnectionError, TimeoutError, ReadTimeout) as error:
+        except (ConnectionError, TimeoutError, RequestException) as error:
             logger.error('В работе бота возникло исключение', exc_info=error)
-            bot.send_message(user.user.user_id, constants.REQUEST_ERROR)
+            user_id = get_user_id(args)
+            if user_id is not None:
+                bot.send_message(user_id, constants.REQUEST_ERROR)
     return wrapped_func
@@ -3,11 +3,21 @@
 """
 
 import handlers
+import metrics
 from database.models import DataBaseModel
 from loader import bot, logger
+from settings.settings import BOT_MODE, BOT_RUNTIME
 
 
 if __name__ == '__main__':
-    DataBaseModel._init_user_tables()
-    bot.infinity_polling()
-    logger.info('bot start working')
+    DataBaseModel.migrate()
+    metrics.start()
+    if BOT_MODE == 'webhook':
+        import webhook
+        webhook.run()
+    elif BOT_RUNTIME == 'threaded':
+        bot.infinity_polling()
+        logger.info('bot start working')
+    else:
+        from dispatcher import dispatcher
+        dispatcher.poll()
@@ -0,0 +1,269 @@
+"""
+Файл с метриками бота: гистограммы времени выполнения и счётчики ошибок обработчиков, запросов к API hotels4,
+методов DataBaseModel и запросов к Telegram (декоратор timed), а так же показатели, которые собираются
+в момент выгрузки (кэши, пул потоков-обработчиков). Метрики отдаются в текстовом формате Prometheus
+по адресу http://METRICS_HOST:METRICS_PORT/metrics и выводятся в лог по сигналу SIGUSR1.
+"""
+
+import bisect
+import functools
+import logging
+import signal
+import threading
+import time
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Iterable, List, Tuple
+from telebot import apihelper
+from settings.settings import METRICS_HOST, METRICS_PORT
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+DURATION = 'bot_duration_seconds'
+ERRORS = 'bot_errors_total'
+Labels = Tuple[Tuple[str, str], ...]
+Sample = Tuple[str, str, Dict[str, Any], float]
+
+
+class Registry:
+    """
+    Класс - хранилище метрик: гистограммы времени и счётчики по набору меток, а так же сборщики показателей
+    """
+    def __init__(self) -> None:
+        self._histograms: Dict[Labels, List] = {}
+        self._counters: Dict[Tuple[str, Labels], float] = {}
+        self._collectors: List[Callable[[], Iterable[Sample]]] = []
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float, /, **labels: str) -> None:
+        """
+        Метод класса Registry, добавляющий время выполнения в гистограмму bot_duration_seconds
+
+        :param seconds: float
+        :param labels: str
+        :return: None
+        """
+        key = tuple(sorted(labels.items()))
+        index = bisect.bisect_left(BUCKETS, seconds)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [[0] * (len(BUCKETS) + 1), 0.0]
+            histogram[0][index] += 1
+            histogram[1] += seconds
+
+    def inc(self, metric: str, value: float = 1, /, **labels: str) -> None:
+        """
+        Метод класса Registry, увеличивающий счётчик metric (метки передаются именованными аргументами)
+
+        :param metric: str
+        :param value: float
+        :param labels: str
+        :return: None
+        """
+        key = (metric, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def register_collector(self, collector: Callable[[], Iterable[Sample]]) -> None:
+        """
+        Метод класса Registry, добавляющий сборщик показателей. Сборщик вызывается при каждой выгрузке
+        и возвращает кортежи (имя, тип, метки, значение).
+
+        :param collector: Callable[[], Iterable[Sample]]
+        :return: None
+        """
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        """
+        Метод класса Registry, возвращающий все метрики в текстовом формате Prometheus
+
+        :return: str
+        """
+        with self._lock:
+            histograms = [(key, list(counts), total) for key, (counts, total) in self._histograms.items()]
+            counters = list(self._counters.items())
+        lines = ['# TYPE {} histogram'.format(DURATION)]
+        for key, counts, total in sorted(histograms, key=lambda histogram: histogram[0]):
+            labels = dict(key)
+            cumulative = 0
+            for bound, count in zip(BUCKETS + (float('inf'), ), counts):
+                cumulative += count
+                bucket_labels = dict(labels, le='+Inf' if bound == float('inf') else repr(bound))
+                lines.append('{}_bucket{} {}'.format(DURATION, format_labels(bucket_labels), cumulative))
+            lines.append('{}_sum{} {}'.format(DURATION, format_labels(labels), total))
+            lines.append('{}_count{} {}'.format(DURATION, format_labels(labels), cumulative))
+        samples = [(name, 'counter', dict(key), value) for (name, key), value in sorted(counters)]
+        for collector in self._collectors:
+            try:
+                samples.extend(collector())
+            except Exception as error:
+                logging.getLogger('bot_logger').error('Ошибка сбора метрик', exc_info=error)
+        typed = set()
+        for name, metric_type, labels, value in sorted(samples, key=lambda sample: sample[0]):
+            if name not in typed:
+                typed.add(name)
+                lines.append('# TYPE {} {}'.format(name, metric_type))
+            lines.append('{}{} {}'.format(name, format_labels(labels), value))
+        return '\n'.join(lines) + '\n'
+
+
+def format_labels(labels: Dict[str, Any]) -> str:
+    """
+    Функция - возвращающая метки в формате Prometheus: {kind="db",name="insert_user"}
+
+    :param labels: Dict[str, Any]
+    :return: str
+    """
+    if not labels:
+        return ''
+    return '{' + ','.join(
+        '{}="{}"'.format(key, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for key, value in sorted(labels.items())
+    ) + '}'
+
+
+registry = Registry()
+dump_requested = threading.Event()
+
+
+def timed(kind: str, name: str = None) -> Callable:
+    """
+    Декоратор - записывающий время выполнения функции в гистограмму (метки kind и name, по умолчанию
+    имя функции) и считающий исключения в bot_errors_total. Исключение выбрасывается дальше.
+
+    :param kind: str
+    :param name: str
+    :return: Callable
+    """
+    def decorator(func: Callable) -> Callable:
+        label = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapped_func(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            except Exception:
+                registry.inc(ERRORS, kind=kind, name=label)
+                raise
+            finally:
+                registry.observe(time.perf_counter() - started, kind=kind, name=label)
+        return wrapped_func
+    return decorator
+
+
+def count_error(kind: str, name: str) -> None:
+    """
+    Функция - учитывающая ошибку, которая была обработана без выброса исключения (декораторы loader)
+
+    :param kind: str
+    :param name: str
+    :return: None
+    """
+    registry.inc(ERRORS, kind=kind, name=name)
+
+
+def telegram_request(method: str, url: str, **kwargs: Any) -> Any:
+    """
+    Функция - отправляющая запрос к Telegram Bot API (apihelper.CUSTOM_REQUEST_SENDER) с записью времени
+    по имени метода API. Ответ с кодом, отличным от 200, считается ошибкой.
+
+    :param method: str
+    :param url: str
+    :param kwargs: Any
+    :return: Any
+    """
+    api_method = url.rsplit('/', 1)[-1]
+    started = time.perf_counter()
+    try:
+        response = apihelper._get_req_session().request(method, url, **kwargs)
+    except Exception:
+        count_error('telegram', api_method)
+        raise
+    finally:
+        registry.observe(time.perf_counter() - started, kind='telegram', name=api_method)
+    if response.status_code != 200:
+        count_error('telegram', api_method)
+    return response
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    """
+    Дочерний Класс (Родитель - BaseHTTPRequestHandler). Отдаёт метрики по адресу /metrics
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self) -> None:
+        """
+        Метод класса MetricsHandler, отправляющий метрики в текстовом формате Prometheus
+
+        :return: None
+        """
+        if self.path != '/metrics':
+            body, status = b'', 404
+        else:
+            body, status = registry.render().encode(), 200
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        """
+        Метод класса MetricsHandler, отключающий журнал запросов http.server
+
+        :param format: str
+        :param args: Any
+        :return: None
+        """
+
+
+def dump() -> None:
+    """
+    Функция - выводящая метрики в лог
+
+    :return: None
+    """
+    logging.getLogger('bot_logger').info('Метрики:\n' + registry.render())
+
+
+def request_dump(signum: int, frame: Any) -> None:
+    """
+    Функция - обработчик сигнала SIGUSR1. Python выполняет его в главном потоке, который в этот момент
+    может держать блокировку Registry, поэтому обработчик только будит поток dump_loop.
+
+    :param signum: int
+    :param frame: Any
+    :return: None
+    """
+    dump_requested.set()
+
+
+def dump_loop() -> None:
+    """
+    Функция - поток, выводящий метрики в лог по каждому сигналу SIGUSR1
+
+    :return: None
+    """
+    while True:
+        dump_requested.wait()
+        dump_requested.clear()
+        dump()
+
+
+def start() -> None:
+    """
+    Функция - запускающая HTTP-сервер метрик (если METRICS_PORT не 0) и обработчик сигнала SIGUSR1.
+    Вызывается из главного потока.
+
+    :return: None
+    """
+    if METRICS_PORT:
+        server = ThreadingHTTPServer((METRICS_HOST, METRICS_PORT), MetricsHandler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name='metrics', daemon=True).start()
+    if hasattr(signal, 'SIGUSR1'):
+        threading.Thread(target=dump_loop, name='metrics-dump', daemon=True).start()
+        signal.signal(signal.SIGUSR1, request_dump)
@@ -0,0 +1,297 @@
+"""
+Файл с очередью исходящих запросов к Telegram. Перед каждой отправкой (или редактированием) сообщения
+запрос ждёт свободного места в ограничителях: отдельном для чата и общем для бота (token bucket).
+Каждое сообщение (и каждая фотография медиа-группы) расходует токен, редактирование сообщений
+расходует только токен общего ограничителя. Общий ограничитель пропускает ожидающие запросы по приоритету:
+ответы на действия пользователя отправляются раньше массового вывода результатов (блок bot.bulk()).
+При ответе 429 запрос повторяется через указанное Telegram время retry_after, а чат и общий ограничитель
+приостанавливаются на это же время.
+"""
+
+import heapq
+import itertools
+import threading
+import time
+import metrics
+
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+from telebot import TeleBot
+from telebot.apihelper import ApiTelegramException
+from settings.settings import SEND_GLOBAL_RATE, SEND_CHAT_RATE, SEND_CHAT_BURST, SEND_MAX_RETRIES
+
+INTERACTIVE = 0
+BULK = 1
+PRIORITY_NAMES = {INTERACTIVE: 'interactive', BULK: 'bulk'}
+SWEEP_INTERVAL = 60
+
+
+class TokenBucket:
+    """
+    Класс - ограничитель частоты запросов (token bucket). Не потокобезопасен, вызывается под блокировкой SendQueue.
+    """
+    def __init__(self, rate: float, capacity: float) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """
+        Метод класса TokenBucket, возвращающий время ожидания, через которое будет доступно amount токенов
+
+        :param amount: float
+        :param now: float
+        :return: float
+        """
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        return max(self.paused_until - now, (amount - self.tokens) / self.rate, 0.0)
+
+    def reserve(self, amount: float, now: float) -> float:
+        """
+        Метод класса TokenBucket, резервирующий amount токенов. Ожидание длится, пока не накопится
+        не больше capacity токенов, а запас уходит в минус на остаток, поэтому следующие запросы ждут,
+        пока он восстановится. Возвращает время, которое нужно подождать до отправки.
+
+        :param amount: float
+        :param now: float
+        :return: float
+        """
+        wait = self.wait_time(min(amount, self.capacity), now)
+        self.tokens -= amount
+        return wait
+
+    def pause(self, seconds: float, now: float) -> None:
+        """
+        Метод класса TokenBucket, приостанавливающий выдачу токенов на seconds секунд
+
+        :param seconds: float
+        :param now: float
+        :return: None
+        """
+        self.paused_until = max(self.paused_until, now + seconds)
+
+
+class SendQueue:
+    """
+    Класс - очередь исходящих запросов с ограничением частоты для каждого чата и для бота в целом
+    """
+    def __init__(self, global_rate: float = SEND_GLOBAL_RATE, chat_rate: float = SEND_CHAT_RATE,
+                 chat_burst: float = SEND_CHAT_BURST, max_retries: int = SEND_MAX_RETRIES) -> None:
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.max_retries = max_retries
+        self._global = TokenBucket(global_rate, global_rate)
+        self._chats: Dict[Any, TokenBucket] = {}
+        self._waiting: List[Tuple[int, int]] = []
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+        self._last_sweep = time.monotonic()
+
+    def acquire(self, chat_id: Any, amount: float, priority: int) -> None:
+        """
+        Метод класса SendQueue, ожидающий разрешения на отправку amount сообщений в чат (0 - редактирование).
+        Сначала запрос ждёт своей очереди в ограничителе чата (редактирование ждёт только окончания паузы
+        после ответа 429), затем - в общем ограничителе (не меньше одного токена на запрос), где первым
+        пропускается запрос с меньшим приоритетом (а при равном - пришедший раньше).
+
+        :param chat_id: Any
+        :param amount: float
+        :param priority: int
+        :return: None
+        """
+        with self._condition:
+            now = time.monotonic()
+            self._sweep(now)
+            chat = self._chats.get(chat_id)
+            if chat is None:
+                chat = self._chats[chat_id] = TokenBucket(self.chat_rate, self.chat_burst)
+            if amount:
+                chat_wait = chat.reserve(amount, now)
+            else:
+                chat_wait = chat.paused_until - now
+        if chat_wait > 0:
+            time.sleep(chat_wait)
+        cost = max(amount, 1)
+        ticket = (priority, next(self._counter))
+        with self._condition:
+            heapq.heappush(self._waiting, ticket)
+            while True:
+                if self._waiting[0] == ticket:
+                    wait = self._global.wait_time(min(cost, self._global.capacity), time.monotonic())
+                    if wait <= 0:
+                        self._global.tokens -= cost
+                        heapq.heappop(self._waiting)
+                        self._condition.notify_all()
+                        return
+                    self._condition.wait(wait)
+                else:
+                    self._condition.wait()
+
+    def pause(self, chat_id: Any, seconds: float) -> None:
+        """
+        Метод класса SendQueue, приостанавливающий отправку в чат и общий ограничитель (после ответа 429)
+
+        :param chat_id: Any
+        :param seconds: float
+        :return: None
+        """
+        with self._condition:
+            now = time.monotonic()
+            self._global.pause(seconds, now)
+            chat = self._chats.get(chat_id)
+            if chat is not None:
+                chat.pause(seconds, now)
+
+    def call(self, chat_id: Any, amount: float, priority: int, method: Callable, /, *args: Any, **kwargs: Any) -> Any:
+        """
+        Метод класса SendQueue, выполняющий запрос к Telegram после получения разрешения на отправку.
+        При ответе 429 запрос повторяется (не более max_retries раз) после паузы retry_after.
+        Время ожидания в очереди записывается в метрики (kind = send_queue).
+        Параметры очереди только позиционные, чтобы не пересекаться с именованными аргументами метода (chat_id).
+
+        :param chat_id: Any
+        :param amount: float
+        :param priority: int
+        :param method: Callable
+        :param args: Any
+        :param kwargs: Any
+        :return: Any
+        """
+        for attempt in range(self.max_retries + 1):
+            started = time.perf_counter()
+            self.acquire(chat_id, amount, priority)
+            metrics.registry.observe(time.perf_counter() - started, kind='send_queue', name=PRIORITY_NAMES[priority])
+            try:
+                return method(*args, **kwargs)
+            except ApiTelegramException as error:
+                if error.error_code != 429 or attempt == self.max_retries:
+                    raise
+                retry_after = (error.result_json.get('parameters') or {}).get('retry_after', 1)
+                self.pause(chat_id, retry_after)
+
+    def _sweep(self, now: float) -> None:
+        """
+        Метод класса SendQueue, удаляющий ограничители чатов, которые полностью восстановились.
+        Выполняется под блокировкой не чаще, чем раз в SWEEP_INTERVAL секунд.
+
+        :param now: float
+        :return: None
+        """
+        if now - self._last_sweep < SWEEP_INTERVAL:
+            return
+        self._last_sweep = now
+        idle = [chat_id for chat_id, chat in self._chats.items() if chat.wait_time(chat.capacity, now) == 0]
+        for chat_id in idle:
+            del self._chats[chat_id]
+
+
+class QueuedTeleBot(TeleBot):
+    """
+    Дочерний Класс (Родитель - TeleBot). Отправляет и редактирует сообщения через очередь SendQueue.
+    Вызовы внутри блока bulk() считаются массовым выводом и уступают очередь ответам на действия пользователя.
+    """
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.send_queue = SendQueue()
+        self._local = threading.local()
+
+    def _exec_task(self, task: Callable, *args: Any, **kwargs: Any) -> None:
+        """
+        Метод класса QueuedTeleBot, выполняющий обработчик обновления с записью его времени в метрики
+
+        :param task: Callable
+        :param args: Any
+        :param kwargs: Any
+        :return: None
+        """
+        super()._exec_task(metrics.timed('handler')(task), *args, **kwargs)
+
+    @contextmanager
+    def bulk(self) -> Iterator[None]:
+        """
+        Метод класса QueuedTeleBot, помечающий отправки текущего потока внутри блока как массовый вывод
+
+        :return: Iterator[None]
+        """
+        previous = getattr(self._local, 'priority', INTERACTIVE)
+        self._local.priority = BULK
+        try:
+            yield
+        finally:
+            self._local.priority = previous
+
+    def _queued(self, method: Callable, amount: float, chat_id: Any, /, *args: Any, **kwargs: Any) -> Any:
+        """
+        Метод класса QueuedTeleBot, передающий вызов метода родителя в очередь отправки
+
+        :param method: Callable
+        :param amount: float
+        :param chat_id: Any
+        :param args: Any
+        :param kwargs: Any
+        :return: Any
+        """
+        priority = getattr(self._local, 'priority', INTERACTIVE)
+        return self.send_queue.call(chat_id, amount, priority, method, chat_id, *args, **kwargs)
+
+    def send_message(self, chat_id: Any, *args: Any, **kwargs: Any) -> Any:
+        """
+        Метод класса QueuedTeleBot, отправляющий сообщение через очередь
+
+        :param chat_id: Any
+        :param args: Any
+        :param kwargs: Any
+        :return: Any
+        """
+        return self._queued(super().send_message, 1, chat_id, *args, **kwargs)
+
+    def send_media_group(self, chat_id: Any, *args: Any, **kwargs: Any) -> Any:
+        """
+        Метод класса QueuedTeleBot, отправляющий медиа-группу через очередь. Каждая фотография
+        медиа-группы расходует отдельный токен.
+
+        :param chat_id: Any
+        :param args: Any
+        :param kwargs: Any
+        :return: Any
+        """
+        media = kwargs.get('media', args[0] if args else [])
+        return self._queued(super().send_media_group, max(len(media), 1), chat_id, *args, **kwargs)
+
+    def edit_message_text(self, *args: Any, **kwargs: Any) -> Any:
+        """
+        Метод класса QueuedTeleBot, редактирующий текст сообщения через очередь
+
+        :param args: Any
+        :param kwargs: Any
+        :return: Any
+        """
+        return self._edit(super().edit_message_text, args, kwargs, position=1)
+
+    def edit_message_reply_markup(self, *args: Any, **kwargs: Any) -> Any:
+        """
+        Метод класса QueuedTeleBot, редактирующий клавиатуру сообщения через очередь
+
+        :param args: Any
+        :param kwargs: Any
+        :return: Any
+        """
+        return self._edit(super().edit_message_reply_markup, args, kwargs, position=0)
+
+    def _edit(self, method: Callable, args: tuple, kwargs: dict, position: int) -> Any:
+        """
+        Метод класса QueuedTeleBot, передающий в очередь редактирование сообщения (не расходует токены
+        ограничителя чата). Id чата берётся из именованного аргумента chat_id, или из позиционного аргумента position.
+
+        :param method: Callable
+        :param args: tuple
+        :param kwargs: dict
+        :param position: int
+        :return: Any
+        """
+        chat_id = kwargs.get('chat_id', args[position] if len(args) > position else None)
+        priority = getattr(self._local, 'priority', INTERACTIVE)
+        return self.send_queue.call(chat_id, 0, priority, method, *args, **kwargs)
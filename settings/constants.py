@@ -53,12 +53,13 @@ RESULT_MIN_DISTANCE = 'Минимальное расстояние: {}'
 RESULT_MAX_DISTANCE = 'Максимальное расстояние: {}'
 NOT_FOUND = 'К сожалению, по заданным критериям отели не найдены!\nПопробуйте расширить диапазоны: цены и расстояния'
 HISTORY_MENU_MESSAGE = 'Вы можете просматривать и очищать историю поиска.\nВыберите действие: '
-HISTORY_SHOW_MESSAGE = 'Полная история - содержит все ваши результаты поиска отелей.' \
+HISTORY_SHOW_MESSAGE = 'Полная история - содержит все ваши результаты поиска отелей (постранично).' \
                        '\nПоследние действия - содержит последние 5 результатов поиска.'
 HISTORY_DELETE = 'История успешно очищена'
 HISTORY_EMPTY_HOTELS = 'По данному запросу отели не были найдены'
 HISTORY_EMPTY = 'История запросов пустая.'
 HISTORY_COMPLETE = 'Показ истории завершён'
+HISTORY_NEXT_PAGE = 'Показать более ранние поиски?'
 
 
 COMMAND = ['start', 'help', 'lowprice', 'highprice', 'bestdeal', 'history']
@@ -94,3 +95,7 @@ HISTORY_COMMAND_EN = "Date and time: {}\n" \
                      "City: {}\n" \
                      "Date of residence from: {}\n" \
                      "Date of residence by: {}\n"
+
+
+CURRENCY_SYMBOLS = {'USD': '$', 'EUR': '€', 'RUB': 'RUB'}
+DISTANCE_UNITS = {'en_US': 'km', 'ru_RU': 'км'}
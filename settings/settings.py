@@ -12,6 +12,38 @@ else:
 
 TOKEN = os.environ.get('TOKEN')
 API_KEY = os.environ.get('API_KEY')
+BOT_NUM_THREADS = int(os.environ.get('BOT_NUM_THREADS', 4))
+SEND_GLOBAL_RATE = float(os.environ.get('SEND_GLOBAL_RATE', 30))
+SEND_CHAT_RATE = float(os.environ.get('SEND_CHAT_RATE', 1))
+SEND_CHAT_BURST = float(os.environ.get('SEND_CHAT_BURST', 1))
+SEND_MAX_RETRIES = int(os.environ.get('SEND_MAX_RETRIES', 5))
+BOT_RUNTIME = os.environ.get('BOT_RUNTIME', 'sharded')
+DISPATCH_WORKERS = int(os.environ.get('DISPATCH_WORKERS', 8))
+POLL_TIMEOUT = int(os.environ.get('POLL_TIMEOUT', 20))
+POLL_RETRY_DELAY = float(os.environ.get('POLL_RETRY_DELAY', 3))
+
+METRICS_HOST = os.environ.get('METRICS_HOST', '127.0.0.1')
+METRICS_PORT = int(os.environ.get('METRICS_PORT', 9108))
+
+BOT_MODE = os.environ.get('BOT_MODE', 'polling')
+WEBHOOK_URL = os.environ.get('WEBHOOK_URL')
+WEBHOOK_HOST = os.environ.get('WEBHOOK_HOST', '0.0.0.0')
+WEBHOOK_PORT = int(os.environ.get('WEBHOOK_PORT', 8080))
+WEBHOOK_PATH = os.environ.get('WEBHOOK_PATH', '/webhook')
+WEBHOOK_SECRET = os.environ.get('WEBHOOK_SECRET')
+WEBHOOK_MAX_BODY = int(os.environ.get('WEBHOOK_MAX_BODY', 1048576))
+WEBHOOK_IDLE_TIMEOUT = float(os.environ.get('WEBHOOK_IDLE_TIMEOUT', 75))
+
+DB_PATH = os.environ.get('DB_PATH', 'hotel_database.db')
+DB_STATEMENT_CACHE = int(os.environ.get('DB_STATEMENT_CACHE', 128))
+DB_BUSY_TIMEOUT = float(os.environ.get('DB_BUSY_TIMEOUT', 5))
+
+HISTORY_PAGE_SIZE = int(os.environ.get('HISTORY_PAGE_SIZE', 5))
+HISTORY_RECENT_SIZE = int(os.environ.get('HISTORY_RECENT_SIZE', 5))
+
+SESSION_STORAGE = os.environ.get('SESSION_STORAGE', 'memory')
+SESSION_TTL = int(os.environ.get('SESSION_TTL', 86400))
+SESSION_SWEEP_INTERVAL = int(os.environ.get('SESSION_SWEEP_INTERVAL', 60))
 
 
 HEADERS = {
@@ -20,12 +52,42 @@ HEADERS = {
 }
 
 
-URL_SEARCH = 'https://hotels4.p.rapidapi.com/locations/v2/search'
-URL_PROPERTY_LIST = 'https://hotels4.p.rapidapi.com/properties/list'
-URL_PHOTO = 'https://hotels4.p.rapidapi.com/properties/get-hotel-photos'
+HOTELS_API_URL = os.environ.get('HOTELS_API_URL', 'https://hotels4.p.rapidapi.com')
+TELEGRAM_API_URL = os.environ.get('TELEGRAM_API_URL')
+URL_SEARCH = HOTELS_API_URL + '/locations/v2/search'
+URL_PROPERTY_LIST = HOTELS_API_URL + '/properties/list'
+URL_PHOTO = HOTELS_API_URL + '/properties/get-hotel-photos'
 URL_HOTEL = 'https://www.hotels.com/ho{}'
 
 
+HTTP_POOL_SIZE = int(os.environ.get('HTTP_POOL_SIZE', 20))
+HTTP_RETRIES = int(os.environ.get('HTTP_RETRIES', 3))
+HTTP_BACKOFF_FACTOR = float(os.environ.get('HTTP_BACKOFF_FACTOR', 0.5))
+HTTP_MAX_RETRY_AFTER = float(os.environ.get('HTTP_MAX_RETRY_AFTER', 5))
+REQUEST_WORKERS = int(os.environ.get('REQUEST_WORKERS', 8))
+MEDIA_WORKERS = int(os.environ.get('MEDIA_WORKERS', 16))
+BESTDEAL_MAX_PAGES = int(os.environ.get('BESTDEAL_MAX_PAGES', 3))
+BESTDEAL_FANOUT = int(os.environ.get('BESTDEAL_FANOUT', 3))
+BESTDEAL_PRICE_WEIGHT = float(os.environ.get('BESTDEAL_PRICE_WEIGHT', 0.5))
+BESTDEAL_DISTANCE_WEIGHT = float(os.environ.get('BESTDEAL_DISTANCE_WEIGHT', 0.4))
+BESTDEAL_STARS_WEIGHT = float(os.environ.get('BESTDEAL_STARS_WEIGHT', 0.1))
+HTTP_CONNECT_TIMEOUT = float(os.environ.get('HTTP_CONNECT_TIMEOUT', 3.05))
+TIMEOUTS = {
+    'search': float(os.environ.get('TIMEOUT_SEARCH', 10)),
+    'property_list': float(os.environ.get('TIMEOUT_PROPERTY_LIST', 15)),
+    'photo': float(os.environ.get('TIMEOUT_PHOTO', 10)),
+    'media': float(os.environ.get('TIMEOUT_MEDIA', 5))
+}
+
+CACHE_STORAGE = os.environ.get('CACHE_STORAGE', 'memory')
+CITY_CACHE_SIZE = int(os.environ.get('CITY_CACHE_SIZE', 2048))
+CITY_CACHE_TTL = int(os.environ.get('CITY_CACHE_TTL', 86400))
+PROPERTY_CACHE_SIZE = int(os.environ.get('PROPERTY_CACHE_SIZE', 256))
+PROPERTY_CACHE_TTL = int(os.environ.get('PROPERTY_CACHE_TTL', 600))
+PHOTO_CACHE_SIZE = int(os.environ.get('PHOTO_CACHE_SIZE', 8192))
+PHOTO_CACHE_TTL = int(os.environ.get('PHOTO_CACHE_TTL', 3600))
+
+
 QUERY_SEARCH = {
     'query': 'new_york',
     'locale': 'en_US',
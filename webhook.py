@@ -0,0 +1,118 @@
+"""
+Файл с приёмом обновлений через webhook (BOT_MODE = 'webhook'). Встроенный HTTP-сервер (http.server)
+принимает POST-запросы Telegram по пути WEBHOOK_PATH, проверяет секретный токен из заголовка
+X-Telegram-Bot-Api-Secret-Token и передаёт обновление в пул потоков-обработчиков (dispatcher).
+Ответ отправляется сразу после постановки обновления в очередь, с Content-Length и по HTTP/1.1,
+поэтому соединение с Telegram (или балансировщиком) остаётся открытым для следующих запросов.
+TLS завершается на балансировщике, или обратном прокси, перед ботом.
+"""
+
+import hmac
+import json
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from telebot import apihelper
+from telebot.types import Update
+from dispatcher import dispatcher
+from loader import logger
+from settings.settings import (TOKEN, WEBHOOK_URL, WEBHOOK_HOST, WEBHOOK_PORT, WEBHOOK_PATH, WEBHOOK_SECRET,
+                               WEBHOOK_MAX_BODY, WEBHOOK_IDLE_TIMEOUT)
+
+SECRET_HEADER = 'X-Telegram-Bot-Api-Secret-Token'
+
+
+class WebhookHandler(BaseHTTPRequestHandler):
+    """
+    Дочерний Класс (Родитель - BaseHTTPRequestHandler). Обработчик запросов Telegram к webhook
+    """
+    protocol_version = 'HTTP/1.1'
+    timeout = WEBHOOK_IDLE_TIMEOUT
+
+    def do_POST(self) -> None:
+        """
+        Метод класса WebhookHandler, принимающий обновление и передающий его в dispatcher
+
+        :return: None
+        """
+        if self.path != WEBHOOK_PATH:
+            return self.reply(404)
+        secret = self.headers.get(SECRET_HEADER, '')
+        if WEBHOOK_SECRET and not hmac.compare_digest(secret.encode(), WEBHOOK_SECRET.encode()):
+            return self.reply(403)
+        try:
+            length = int(self.headers.get('Content-Length', ''))
+        except ValueError:
+            return self.reply(411)
+        if not 0 <= length <= WEBHOOK_MAX_BODY:
+            self.close_connection = True
+            return self.reply(400)
+        body = self.rfile.read(length)
+        try:
+            update = Update.de_json(json.loads(body))
+        except (ValueError, KeyError, TypeError) as error:
+            logger.error('Некорректное обновление webhook', exc_info=error)
+            return self.reply(400)
+        dispatcher.dispatch([update])
+        self.reply(200)
+
+    def reply(self, status: int) -> None:
+        """
+        Метод класса WebhookHandler, отправляющий пустой ответ с длиной тела (соединение остаётся открытым).
+        Если тело запроса не было прочитано, соединение закрывается.
+
+        :param status: int
+        :return: None
+        """
+        if status in (404, 403, 411):
+            self.close_connection = True
+        self.send_response(status)
+        self.send_header('Content-Length', '0')
+        if self.close_connection:
+            self.send_header('Connection', 'close')
+        self.end_headers()
+
+    def log_message(self, format: str, *args) -> None:
+        """
+        Метод класса WebhookHandler, отключающий журнал запросов http.server (вывод в stderr на каждый запрос)
+
+        :param format: str
+        :param args: Any
+        :return: None
+        """
+
+
+class WebhookServer(ThreadingHTTPServer):
+    """
+    Дочерний Класс (Родитель - ThreadingHTTPServer). Многопоточный HTTP-сервер webhook
+    """
+    daemon_threads = True
+
+
+def set_webhook() -> None:
+    """
+    Функция - регистрирующая webhook в Telegram вместе с секретным токеном
+    (TeleBot.set_webhook этой версии не передаёт secret_token, поэтому метод API вызывается напрямую)
+
+    :return: None
+    """
+    params = {'url': WEBHOOK_URL}
+    if WEBHOOK_SECRET:
+        params['secret_token'] = WEBHOOK_SECRET
+    apihelper._make_request(TOKEN, 'setWebhook', params=params, method='post')
+
+
+def run() -> None:
+    """
+    Функция - запускающая бота в режиме webhook: потоки-обработчики, регистрация webhook и HTTP-сервер
+
+    :return: None
+    """
+    if not WEBHOOK_URL:
+        exit('Не задан WEBHOOK_URL для режима webhook')
+    if not WEBHOOK_SECRET:
+        logger.warning('WEBHOOK_SECRET не задан: запросы к webhook не проверяются')
+    dispatcher.start()
+    set_webhook()
+    server = WebhookServer((WEBHOOK_HOST, WEBHOOK_PORT), WebhookHandler)
+    logger.info('bot start working (webhook, {}:{})'.format(WEBHOOK_HOST, WEBHOOK_PORT))
+    server.serve_forever()